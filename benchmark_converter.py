@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Per-stage throughput benchmark for stata_to_csv_converter
+
+Times each conversion stage (read, OpenCC conversion, PersonUID, CSV write, Excel
+write) on synthetic CGED-Q-shaped files from synthetic_cgedq.py, or on given .dta
+files, and appends one JSON line per stage to a results file so throughput can be
+compared across converter versions and regressions caught.
+
+Usage:
+    python benchmark_converter.py                       # 10k and 100k synthetic rows
+    python benchmark_converter.py --rows 1000000 --skip excel
+    python benchmark_converter.py dta/<file>.dta --repeat 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+STAGES = ['read', 'opencc', 'person_uid', 'csv', 'excel']
+
+DEFAULT_ROWS = [10000, 100000]
+
+# Excel is far slower than every other stage and capped at 1,048,576 rows per sheet
+EXCEL_MAX_ROWS = 200000
+
+def get_git_revision():
+    """Short git revision of the working tree, or None outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def time_stage(func, repeat):
+    """Best wall time of `repeat` runs of func, and its last result"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def benchmark_file(stata_file, stages, repeat, work_dir):
+    """
+    Time each selected stage on one .dta file; returns a list of result dicts
+    
+    Stages run in conversion order and each one feeds the next, so later stages see
+    the same input as in a real conversion. The OpenCC memo cache is cleared before
+    every run, so the stage is measured cold as for the first file of a process.
+    """
+    import contextlib
+    import io
+    import pyreadstat
+    import stata_to_csv_converter as converter
+    
+    def convert():
+        converter._traditional_value_cache.clear()
+        return converter.convert_dataframe_to_traditional(df)
+    
+    base_name = os.path.splitext(os.path.basename(stata_file))[0]
+    timings = {}
+    seconds, (df, meta) = time_stage(lambda: pyreadstat.read_dta(stata_file), repeat)
+    timings['read'] = seconds
+    seconds, df = time_stage(convert, repeat)
+    timings['opencc'] = seconds
+    seconds, df = time_stage(lambda: converter.add_person_uid_column(df.copy()), repeat)
+    timings['person_uid'] = seconds
+    
+    # The writers print a line per file; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for stage, output_format in [('csv', 'csv'), ('excel', 'excel')]:
+            if stage not in stages:
+                continue
+            if stage == 'excel' and len(df) > EXCEL_MAX_ROWS:
+                continue
+            extension, _, writer = converter.OUTPUT_WRITERS[output_format]
+            output_path = os.path.join(work_dir, base_name + extension)
+            timings[stage], _ = time_stage(lambda: writer(df, output_path), repeat)
+    
+    return [
+        {
+            'file': os.path.basename(stata_file),
+            'stage': stage,
+            'rows': len(df),
+            'seconds': round(seconds, 4),
+            'rows_per_second': round(len(df) / seconds, 1) if seconds > 0 else None,
+        }
+        for stage, seconds in timings.items() if stage in stages
+    ]
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Benchmark the converter stages on synthetic or real .dta files.")
+    parser.add_argument('inputs', nargs='*', help=".dta files to benchmark (default: synthetic files)")
+    parser.add_argument('--rows', type=int, action='append',
+                        help=f"synthetic file size in rows, repeatable (default: {DEFAULT_ROWS})")
+    parser.add_argument('--seed', type=int, default=0, help="synthetic data seed")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per stage; the best time is kept")
+    parser.add_argument('--skip', action='append', choices=STAGES, default=[],
+                        help="skip a stage (read, OpenCC and PersonUID always run as they feed the writers)")
+    parser.add_argument('--results', default=os.path.join("output", "benchmarks.jsonl"),
+                        help="JSON lines file the results are appended to ('-' for stdout only)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    stages = [stage for stage in STAGES if stage not in args.skip]
+    run_info = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': get_git_revision(),
+        'python': sys.version.split()[0],
+    }
+    
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        inputs = list(args.inputs)
+        if not inputs:
+            from synthetic_cgedq import write_cgedq_dta
+            for rows in args.rows or DEFAULT_ROWS:
+                path = os.path.join(work_dir, f"synthetic_{rows}.dta")
+                print(f"Generating {rows} synthetic rows...")
+                write_cgedq_dta(rows, path, args.seed)
+                inputs.append(path)
+        
+        for stata_file in inputs:
+            print(f"\nBenchmarking {os.path.basename(stata_file)}:")
+            for result in benchmark_file(stata_file, stages, args.repeat, work_dir):
+                print(f"  {result['stage']:<12} {result['seconds']:>9.3f}s  {result['rows_per_second']:>14,.0f} rows/s")
+                results.append({**run_info, **result})
+    
+    if args.results != '-':
+        results_dir = os.path.dirname(args.results)
+        if results_dir:
+            os.makedirs(results_dir, exist_ok=True)
+        with open(args.results, 'a', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        print(f"\nResults appended to {args.results}")
+    else:
+        print("\n".join(json.dumps(result, ensure_ascii=False) for result in results))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
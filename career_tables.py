@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Precomputed per-person career tables and aggregates for the frontend
+
+Groups the converted records by PersonUID, orders each official's records by
+(陽曆年份, 季節號, record_number) and stores the result in compact columnar JSON files,
+so the charts can read careers and counts directly instead of regrouping every record
+in the browser.
+"""
+
+import json
+import os
+import sys
+
+# Order of records within a career; record_number breaks ties within a season
+CAREER_SORT_COLUMNS = ['陽曆年份', '季節號', 'record_number']
+
+# Per-record fields kept in the career sequences (dictionary-encoded)
+CAREER_FIELDS = ['機構一', '官職一', '地區']
+
+CAREER_TABLE_VERSION = 1
+
+# Dimensions of the institution composition cube; labels for missing values match RegionalOfficialChart
+CUBE_DIMENSIONS = ['機構一', '旗分', 'background', '陽曆年份', '地區', 'stage', 'is_last']
+CUBE_MISSING_LABELS = {'機構一': '(無機構)', '旗分': '(無旗分)', '地區': '(無地區)'}
+
+def load_converted_output(path):
+    """Load a converted CSV/Parquet/Feather output produced by stata_to_csv_converter"""
+    import pandas as pd
+    
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    if path.endswith('.feather'):
+        return pd.read_feather(path)
+    return pd.read_csv(path, encoding='utf-8-sig')
+
+def text_column(df, col):
+    """Column as stripped strings with missing values as '' ('' everywhere if the column is absent)"""
+    import numpy as np
+    import pandas as pd
+    
+    if col not in df.columns:
+        return np.full(len(df), '', dtype=object)
+    series = df[col]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Strip each category once; code -1 (missing) picks the trailing ''
+        labels = np.array([str(value).strip() for value in series.cat.categories] + [''], dtype=object)
+        return labels[series.cat.codes.to_numpy()]
+    return series.fillna('').astype(str).str.strip().to_numpy(dtype=object)
+
+def standardized_background(df):
+    """Vectorised getStandardizedBackground from frontend/src/utils/dataUtils.js"""
+    import numpy as np
+    
+    background = text_column(df, '出身一')
+    banner = text_column(df, '旗分')
+    return np.where(background != '', background,
+                    np.where(banner != '', '沒考試的旗人', '(無出身記錄)')).astype(object)
+
+def sort_careers(df):
+    """Sort records by PersonUID, then chronologically within each career"""
+    sort_columns = ['PersonUID'] + [col for col in CAREER_SORT_COLUMNS if col in df.columns]
+    return df[df['PersonUID'].notna()].sort_values(sort_columns, kind='stable').reset_index(drop=True)
+
+def get_career_offsets(sorted_df):
+    """Start offset of each person's records in a sort_careers() frame, plus the end offset"""
+    import numpy as np
+    
+    uids = sorted_df['PersonUID'].to_numpy()
+    if len(uids) == 0:
+        return np.array([0], dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, uids[1:] != uids[:-1]])
+    return np.r_[starts, len(uids)].astype(np.int64)
+
+def encode_column(series):
+    """Dictionary-encode a text column; missing values become '' in the dictionary"""
+    import pandas as pd
+    
+    codes, uniques = pd.factorize(series.astype(object).fillna('').astype(str))
+    return codes.tolist(), uniques.tolist()
+
+def build_career_table(df):
+    """
+    Build the per-person career table as a JSON-serialisable dict
+    
+    Records are stored flat in career order ("records"), with "persons.offsets" giving
+    each official's slice: records offsets[i]..offsets[i+1]-1 belong to person i, and
+    consecutive entries in a slice are that official's transitions. Text fields are
+    dictionary-encoded via "dictionaries". First/last postings and the standardized
+    background (as in getStandardizedBackground) are precomputed per person.
+    """
+    import numpy as np
+    import pandas as pd
+    
+    sorted_df = sort_careers(df)
+    offsets = get_career_offsets(sorted_df)
+    starts = offsets[:-1]
+    lasts = offsets[1:] - 1
+    
+    dictionaries = {}
+    records = {}
+    for col in CAREER_FIELDS:
+        if col in sorted_df.columns:
+            codes, dictionaries[col] = encode_column(sorted_df[col])
+            records[col] = codes
+    for col in CAREER_SORT_COLUMNS:
+        if col in sorted_df.columns:
+            # Same coercion as processedData in dataStore.js: missing numbers become 0
+            records[col] = sorted_df[col].fillna(0).astype(np.int64).tolist()
+    
+    first_rows = sorted_df.iloc[starts]
+    if '姓名' in first_rows.columns:
+        names = text_column(first_rows, '姓名')
+    else:
+        names = text_column(first_rows, '姓') + text_column(first_rows, '名')
+    background_codes, dictionaries['background'] = encode_column(pd.Series(standardized_background(first_rows)))
+    
+    persons = {
+        'PersonUID': first_rows['PersonUID'].astype(str).tolist(),
+        '姓名': list(names),
+        'background': background_codes,
+        'offsets': offsets.tolist(),
+        'record_count': (lasts - starts + 1).tolist(),
+    }
+    for col in ['出身一', '旗分']:
+        if col in first_rows.columns:
+            persons[col] = list(text_column(first_rows, col))
+    for col in CAREER_FIELDS:
+        if col in records:
+            codes = np.asarray(records[col])
+            persons[f'first_{col}'] = codes[starts].tolist()
+            persons[f'last_{col}'] = codes[lasts].tolist()
+    if '陽曆年份' in records:
+        years = np.asarray(records['陽曆年份'])
+        persons['first_year'] = years[starts].tolist()
+        persons['last_year'] = years[lasts].tolist()
+    
+    return {
+        'version': CAREER_TABLE_VERSION,
+        'order': [col for col in CAREER_SORT_COLUMNS if col in sorted_df.columns],
+        'person_count': len(starts),
+        'record_count': len(sorted_df),
+        'dictionaries': dictionaries,
+        'persons': persons,
+        'records': records,
+    }
+
+def write_career_table(df, output_path):
+    """Write the per-person career table for a converted DataFrame as compact JSON"""
+    table = build_career_table(df)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(table, f, ensure_ascii=False, separators=(',', ':'))
+    return table
+
+def get_career_stages(offsets):
+    """Person index, 1-based career stage and last-posting flag for each sorted record"""
+    import numpy as np
+    
+    counts = np.diff(offsets)
+    person_index = np.repeat(np.arange(len(counts)), counts)
+    stage = np.arange(offsets[-1]) - np.repeat(offsets[:-1], counts) + 1
+    is_last = stage == np.repeat(counts, counts)
+    return person_index, stage, is_last
+
+def build_composition_cube(df):
+    """
+    Build the institution composition cube as a JSON-serialisable dict
+    
+    One cell per distinct (機構一, 旗分, background, 陽曆年份, 地區, stage, is_last), where
+    stage is the 1-based position of the record in the official's career. Each cell
+    stores its record count and a sorted postings list of person indices into "persons".
+    The chart modes become cell selections: first posting is stage == 1, last posting is
+    is_last, a specific stage is stage == n, and all records is every cell. A person
+    appears at most once per cell, so counts within one stage are person counts; across
+    stages the postings lists give distinct persons.
+    """
+    import numpy as np
+    import pandas as pd
+    
+    sorted_df = sort_careers(df)
+    offsets = get_career_offsets(sorted_df)
+    person_index, stage, is_last = get_career_stages(offsets)
+    
+    keys = {}
+    for col, missing_label in CUBE_MISSING_LABELS.items():
+        values = text_column(sorted_df, col)
+        keys[col] = np.where(values != '', values, missing_label)
+    keys['background'] = standardized_background(sorted_df)
+    keys['陽曆年份'] = (sorted_df['陽曆年份'].fillna(0).astype(np.int64).to_numpy()
+                    if '陽曆年份' in sorted_df.columns else np.zeros(len(sorted_df), dtype=np.int64))
+    keys['stage'] = stage
+    keys['is_last'] = is_last.astype(np.int8)
+    key_frame = pd.DataFrame({col: keys[col] for col in CUBE_DIMENSIONS})
+    
+    cell_id = key_frame.groupby(CUBE_DIMENSIONS, sort=True).ngroup().to_numpy()
+    order = np.lexsort((person_index, cell_id))
+    cell_counts = np.bincount(cell_id, minlength=cell_id.max() + 1 if len(cell_id) else 0)
+    cell_offsets = np.r_[0, np.cumsum(cell_counts)]
+    # First record of each cell in postings order carries the cell's key values
+    cell_keys = key_frame.iloc[order[cell_offsets[:-1]]] if len(order) else key_frame
+    
+    dictionaries = {}
+    cells = {}
+    for col in CUBE_DIMENSIONS:
+        if col in ('陽曆年份', 'stage', 'is_last'):
+            cells[col] = cell_keys[col].astype(np.int64).tolist()
+        else:
+            cells[col], dictionaries[col] = encode_column(cell_keys[col])
+    cells['count'] = cell_counts.tolist()
+    cells['offsets'] = cell_offsets.tolist()
+    
+    return {
+        'version': CAREER_TABLE_VERSION,
+        'dimensions': CUBE_DIMENSIONS,
+        'person_count': len(offsets) - 1,
+        'cell_count': len(cell_counts),
+        'persons': sorted_df['PersonUID'].iloc[offsets[:-1]].astype(str).tolist(),
+        'dictionaries': dictionaries,
+        'cells': cells,
+        'postings': person_index[order].tolist(),
+    }
+
+def write_composition_cube(df, output_path):
+    """Write the institution composition cube for a converted DataFrame as compact JSON"""
+    cube = build_composition_cube(df)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(cube, f, ensure_ascii=False, separators=(',', ':'))
+    return cube
+
+def get_career_table_path(converted_path, suffix='.careers.json'):
+    """Career table (or other precomputed table) path next to a converted output file"""
+    return os.path.splitext(converted_path)[0] + suffix
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python career_tables.py output/<converted file>.csv|.parquet|.feather ...")
+        sys.exit(1)
+    for converted_path in sys.argv[1:]:
+        df = load_converted_output(converted_path)
+        output_path = get_career_table_path(converted_path)
+        table = write_career_table(df, output_path)
+        print(f"Wrote {table['person_count']} careers ({table['record_count']} records): {output_path}")
+        output_path = get_career_table_path(converted_path, '.cube.json')
+        cube = write_composition_cube(df, output_path)
+        print(f"Wrote composition cube ({cube['cell_count']} cells): {output_path}")
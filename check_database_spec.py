@@ -3,20 +3,17 @@
 Script to check if PersonID is mentioned in the database specification or notes
 """
 
-import pyreadstat
 import pandas as pd
-import os
-import glob
-import subprocess
-import sys
+
+from stata_loader import load_stata_file, select_stata_file
 
 def check_database_spec(stata_file):
     """
     Check for any mentions of PersonID in metadata, notes, or documentation
     """
     
-    # Read the Stata file with all metadata
-    df, meta = pyreadstat.read_dta(stata_file)
+    # Read the Stata file (only the columns used below) with all metadata
+    df, meta = load_stata_file(stata_file, usecols=['record_number', '阳历年份', '季节号', '姓', '名', '官职一', '地区'])
     
     print("=" * 80)
     print("CHECKING FOR PERSONID IN METADATA AND NOTES")
@@ -79,44 +76,8 @@ def check_database_spec(stata_file):
         print(f"\nTotal records for {example_name}: {len(example_records)}")
         print("Note: Each record has a different record_number, but represents the same person")
 
-def install_questionary():
-    """Install questionary if not available"""
-    try:
-        import questionary
-    except ImportError:
-        print("Installing questionary...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "questionary"])
-        import questionary
-    return questionary
-
-def select_stata_file():
-    """Let user select a .dta file from dta/ directory"""
-    dta_dir = "dta"
-    if not os.path.exists(dta_dir):
-        print(f"Directory {dta_dir}/ not found.")
-        return None
-    
-    dta_files = glob.glob(os.path.join(dta_dir, "*.dta"))
-    
-    if not dta_files:
-        print("No .dta files found in dta/ directory.")
-        return None
-    
-    questionary = install_questionary()
-    
-    file_choices = [os.path.basename(f) for f in dta_files]
-    selected = questionary.select(
-        "Select a .dta file to check database spec:",
-        choices=file_choices
-    ).ask()
-    
-    if not selected:
-        return None
-    
-    return os.path.join(dta_dir, selected)
-
 if __name__ == "__main__":
-    stata_file = select_stata_file()
+    stata_file = select_stata_file("Select a .dta file to check database spec:")
     if stata_file:
         check_database_spec(stata_file)
     else:
@@ -3,20 +3,76 @@
 Script to check for PersonID patterns in the data
 """
 
-import pyreadstat
-import pandas as pd
 import os
-import glob
-import subprocess
-import sys
+
+import pandas as pd
+
+from stata_loader import load_stata_file, select_stata_file
+
+# Number of example years listed per name in the report
+REPORT_YEAR_SAMPLE = 5
+
+def build_name_ambiguity_report(df):
+    """
+    One row per full name (姓+名) describing how ambiguous it is as an identity
+    
+    Columns: record count, distinct origins (原籍省+原籍县), the largest name+origin group,
+    year span and distinct years, and the most records within a single edition
+    (阳历年份, 季节号) per name and per name+origin. An official is listed once per
+    edition, so more than one record per edition means namesakes served at the same
+    time - from different origins (name collision) or even the same origin (name+origin
+    collision). Everything is computed with groupby passes over the whole frame, so
+    every name is reported without rescanning per name.
+    """
+    grouped = df.groupby('full_name', sort=False)
+    report = grouped.agg(
+        records=('full_name', 'size'),
+        origins=('origin', 'nunique'),
+        first_year=('阳历年份', 'min'),
+        last_year=('阳历年份', 'max'),
+        years=('阳历年份', 'nunique'),
+    )
+    
+    origin_sizes = df.groupby(['full_name', 'origin'], sort=False).size()
+    report['largest_origin_group'] = origin_sizes.groupby(level='full_name').max()
+    
+    edition = [col for col in ['阳历年份', '季节号'] if col in df.columns]
+    edition_sizes = df.groupby(['full_name', 'origin'] + edition, sort=False, dropna=False).size()
+    per_origin = edition_sizes.groupby(level=['full_name'] + edition, sort=False, dropna=False).sum()
+    report['max_records_per_edition'] = per_origin.groupby(level='full_name').max()
+    report['max_records_per_origin_edition'] = edition_sizes.groupby(level='full_name').max()
+    report['name_collision'] = report['max_records_per_edition'] > 1
+    report['name_origin_collision'] = report['max_records_per_origin_edition'] > 1
+    
+    name_years = df[['full_name', '阳历年份']].dropna().drop_duplicates().sort_values(['full_name', '阳历年份'])
+    report['year_sample'] = (
+        name_years.groupby('full_name', sort=False).head(REPORT_YEAR_SAMPLE)
+        .groupby('full_name', sort=False)['阳历年份']
+        .agg(lambda years: ' '.join(str(int(year)) for year in years))
+    )
+    
+    report = report.sort_values(['years', 'records'], ascending=False)
+    report.index.name = 'full_name'
+    return report.reset_index()
+
+def write_name_ambiguity_report(report, stata_file, output_dir="output"):
+    """Write the name ambiguity report as CSV (with BOM) next to the converted outputs"""
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = os.path.splitext(os.path.basename(stata_file))[0]
+    output_path = os.path.join(output_dir, f"{base_name}.personid_report.csv")
+    with open(output_path, 'w', encoding='utf-8-sig') as f:
+        report.to_csv(f, index=False)
+    return output_path
 
 def check_personid_patterns(stata_file):
     """
     Look for PersonID patterns in the data
     """
     
-    # Read the Stata file
-    df, meta = pyreadstat.read_dta(stata_file)
+    # Read the Stata file (only the columns used below)
+    df, meta = load_stata_file(stata_file, usecols=[
+        '姓', '名', '原籍省', '原籍县', '阳历年份', '季节号', '序号', '官职一', '地区', 'record_number'
+    ])
     
     print("Checking for PersonID patterns in the data...\n")
     
@@ -27,28 +83,40 @@ def check_personid_patterns(stata_file):
     
     # Check if combining surname + given name + other fields creates unique IDs
     if '姓' in df.columns and '名' in df.columns:
-        # Create a combined name field
+        # Create the combined name and origin fields once
         df['full_name'] = df['姓'].astype(str) + df['名'].astype(str)
+        if '原籍省' in df.columns and '原籍县' in df.columns:
+            df['origin'] = df['原籍省'].astype(str) + '_' + df['原籍县'].astype(str)
+        else:
+            df['origin'] = ''
+        if '阳历年份' not in df.columns:
+            df['阳历年份'] = pd.NA
+        report = build_name_ambiguity_report(df)
+        name_origin_count = df.groupby(['full_name', 'origin'], sort=False).ngroups
         
         # Count unique combinations
         print(f"\nTotal records: {len(df)}")
-        print(f"Unique full names (姓+名): {df['full_name'].nunique()}")
-        print(f"Duplicate ratio: {1 - (df['full_name'].nunique() / len(df)):.2%}")
-        
-        # Check if adding other fields makes it more unique
-        if '原籍省' in df.columns and '原籍县' in df.columns:
-            df['name_origin'] = df['full_name'] + '_' + df['原籍省'].astype(str) + '_' + df['原籍县'].astype(str)
-            print(f"Unique name+origin combinations: {df['name_origin'].nunique()}")
-            print(f"Duplicate ratio: {1 - (df['name_origin'].nunique() / len(df)):.2%}")
+        print(f"Unique full names (姓+名): {len(report)}")
+        print(f"Duplicate ratio: {1 - (len(report) / len(df)):.2%}")
+        print(f"Unique name+origin combinations: {name_origin_count}")
+        print(f"Duplicate ratio: {1 - (name_origin_count / len(df)):.2%}")
+        print(f"Names recorded with several origins: {(report['origins'] > 1).sum()}")
+        print(f"Names with namesakes serving in the same edition: {report['name_collision'].sum()}")
+        print(f"Name+origin combinations with namesakes in the same edition: "
+              f"{report['name_origin_collision'].sum()}")
         
-        # Show some examples of duplicated names
-        duplicated_names = df[df['full_name'].duplicated(keep=False)].sort_values('full_name')
-        if not duplicated_names.empty:
+        # Show an example of a duplicated name
+        duplicated = report[report['records'] > 1]
+        if not duplicated.empty:
             print("\nExamples of duplicated names:")
-            sample_name = duplicated_names['full_name'].iloc[0]
+            sample_name = duplicated['full_name'].iloc[0]
             sample_records = df[df['full_name'] == sample_name].head(5)
             print(f"\nRecords with name '{sample_name}':")
-            print(sample_records[['阳历年份', '姓', '名', '官职一', '地区', '原籍省', '原籍县']].to_string())
+            print(sample_records[[col for col in ['阳历年份', '姓', '名', '官职一', '地区', '原籍省', '原籍县']
+                                  if col in sample_records.columns]].to_string())
+        
+        output_path = write_name_ambiguity_report(report, stata_file)
+        print(f"\nName ambiguity report for all {len(report)} names written to: {output_path}")
     
     # Check the record_number field
     print("\n" + "=" * 80)
@@ -91,55 +159,16 @@ def check_personid_patterns(stata_file):
     print("SEARCHING FOR HIDDEN ID PATTERNS")
     print("=" * 80)
     
-    # Check if there's a pattern in how officials appear across different years
-    if '姓' in df.columns and '名' in df.columns and '阳历年份' in df.columns:
-        # Find officials who appear in multiple years
-        df['full_name'] = df['姓'].astype(str) + df['名'].astype(str)
-        name_year_counts = df.groupby('full_name')['阳历年份'].nunique().sort_values(ascending=False)
-        
+    # Officials appearing in the most years, straight from the report
+    if '姓' in df.columns and '名' in df.columns:
         print("\nOfficials appearing in multiple years (top 10):")
-        for name, year_count in name_year_counts.head(10).items():
-            years = df[df['full_name'] == name]['阳历年份'].unique()
-            print(f"{name}: appears in {year_count} years - {sorted(years)[:5]}{'...' if len(years) > 5 else ''}")
-
-def install_questionary():
-    """Install questionary if not available"""
-    try:
-        import questionary
-    except ImportError:
-        print("Installing questionary...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "questionary"])
-        import questionary
-    return questionary
-
-def select_stata_file():
-    """Let user select a .dta file from dta/ directory"""
-    dta_dir = "dta"
-    if not os.path.exists(dta_dir):
-        print(f"Directory {dta_dir}/ not found.")
-        return None
-    
-    dta_files = glob.glob(os.path.join(dta_dir, "*.dta"))
-    
-    if not dta_files:
-        print("No .dta files found in dta/ directory.")
-        return None
-    
-    questionary = install_questionary()
-    
-    file_choices = [os.path.basename(f) for f in dta_files]
-    selected = questionary.select(
-        "Select a .dta file to check for PersonID patterns:",
-        choices=file_choices
-    ).ask()
-    
-    if not selected:
-        return None
-    
-    return os.path.join(dta_dir, selected)
+        for row in report.head(10).itertuples(index=False):
+            more = '...' if row.years > REPORT_YEAR_SAMPLE else ''
+            print(f"{row.full_name}: appears in {row.years} years - {row.year_sample}{more} "
+                  f"({row.origins} origins, up to {row.max_records_per_edition} records per edition)")
 
 if __name__ == "__main__":
-    stata_file = select_stata_file()
+    stata_file = select_stata_file("Select a .dta file to check for PersonID patterns:")
     if stata_file:
         check_personid_patterns(stata_file)
     else:
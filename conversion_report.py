@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing and memory instrumentation for stata_to_csv_converter
+
+A ConversionReport is collected for every converted file. Each pipeline stage (read,
+OpenCC conversion, PersonUID, one stage per writer) records wall time, CPU time, rows,
+rows/sec and the process peak RSS, and the report is written as <name>.report.json next
+to the outputs. Optionally the whole conversion runs under cProfile (stats dumped to
+<name>.profile.prof, top functions in the report) or tracemalloc (Python-level peak
+memory per stage and the top allocation sites).
+"""
+
+import contextlib
+import json
+import os
+import sys
+import time
+
+PROFILE_MODES = ['cprofile', 'tracemalloc']
+
+# Functions / allocation sites listed in the report when profiling
+PROFILE_TOP = 20
+
+REPORT_VERSION = 1
+
+def get_peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where resource is unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10), 1)
+
+class ConversionReport:
+    """Collects per-stage metrics for the conversion of one source file"""
+    
+    def __init__(self, source_path, profile=None):
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {profile!r}, expected one of {PROFILE_MODES}")
+        self.source_path = source_path
+        self.profile = profile
+        self.stages = {}
+        self.started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self._profiler = None
+        if profile == 'cprofile':
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif profile == 'tracemalloc':
+            import tracemalloc
+            tracemalloc.start()
+    
+    @contextlib.contextmanager
+    def stage(self, name, rows=None):
+        """
+        Measure the enclosed block as stage `name`
+        
+        Yields a dict whose 'rows' the caller may set once the row count is known.
+        Entering the same stage again (e.g. once per streamed chunk) accumulates time
+        and rows into one entry.
+        """
+        tracing = self.profile == 'tracemalloc'
+        if tracing:
+            import tracemalloc
+            tracemalloc.reset_peak()
+        measurement = {'rows': rows}
+        rss_before = get_peak_rss_mb()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield measurement
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.process_time() - start_cpu
+            peak_rss = get_peak_rss_mb()
+            entry = self.stages.setdefault(name, {
+                'calls': 0, 'rows': None, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                'peak_rss_mb': None, 'rss_growth_mb': None,
+            })
+            entry['calls'] += 1
+            entry['wall_seconds'] += wall
+            entry['cpu_seconds'] += cpu
+            if measurement['rows'] is not None:
+                entry['rows'] = (entry['rows'] or 0) + measurement['rows']
+            if peak_rss is not None:
+                entry['peak_rss_mb'] = peak_rss
+                # How much this stage raised the process high-water mark
+                entry['rss_growth_mb'] = round((entry['rss_growth_mb'] or 0) + peak_rss - rss_before, 1)
+            if tracing:
+                traced_peak = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 1)
+                entry['traced_peak_mb'] = max(entry.get('traced_peak_mb', 0), traced_peak)
+    
+    def _finish_profile(self, report_path):
+        """Stop profiling and return the report's 'profile' section"""
+        if self._profiler is not None:
+            import io
+            import pstats
+            self._profiler.disable()
+            stats_path = report_path.replace('.report.json', '.profile.prof')
+            self._profiler.dump_stats(stats_path)
+            text = io.StringIO()
+            pstats.Stats(self._profiler, stream=text).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            self._profiler = None
+            return {'mode': 'cprofile', 'stats_file': os.path.basename(stats_path),
+                    'top_cumulative': text.getvalue().strip().splitlines()}
+        if self.profile == 'tracemalloc':
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                return None
+            top = tracemalloc.take_snapshot().statistics('lineno')[:PROFILE_TOP]
+            tracemalloc.stop()
+            return {'mode': 'tracemalloc', 'top_allocations': [str(stat) for stat in top]}
+        return None
+    
+    def to_dict(self):
+        """The report as a JSON-serialisable dict (without the profile section)"""
+        stages = {}
+        for name, entry in self.stages.items():
+            entry = dict(entry)
+            entry['wall_seconds'] = round(entry['wall_seconds'], 4)
+            entry['cpu_seconds'] = round(entry['cpu_seconds'], 4)
+            entry['rows_per_second'] = (round(entry['rows'] / entry['wall_seconds'], 1)
+                                        if entry['rows'] and entry['wall_seconds'] > 0 else None)
+            stages[name] = entry
+        return {
+            'version': REPORT_VERSION,
+            'source': os.path.basename(self.source_path),
+            'started_at': self.started_at,
+            'wall_seconds': round(time.perf_counter() - self._start_wall, 4),
+            'cpu_seconds': round(time.process_time() - self._start_cpu, 4),
+            'peak_rss_mb': get_peak_rss_mb(),
+            'stages': stages,
+        }
+    
+    def write(self, report_path):
+        """Stop any profiler and write the report as JSON"""
+        report = self.to_dict()
+        profile = self._finish_profile(report_path)
+        if profile is not None:
+            report['profile'] = profile
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+def format_report(report):
+    """One line per stage for console output"""
+    lines = []
+    for name, entry in report['stages'].items():
+        rate = f"{entry['rows_per_second']:>12,.0f} rows/s" if entry['rows_per_second'] else ' ' * 19
+        rss = f"peak RSS {entry['peak_rss_mb']:.0f} MB" if entry['peak_rss_mb'] is not None else ''
+        lines.append(f"  {name:<16} {entry['wall_seconds']:>8.3f}s wall {entry['cpu_seconds']:>8.3f}s CPU {rate}  {rss}")
+    return "\n".join(lines)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Compact columnar binary dataset bundle for the frontend loader
+
+Instead of a UTF-8 BOM CSV the frontend can fetch <name>.bundle.json (a small header)
+and <name>.bundle.bin (the column buffers). Text columns are dictionary-encoded as
+Uint8/Uint16/Uint32 codes, integral numeric columns are stored as Int32 and all other
+numeric columns as Float64 (NaN for missing), so the browser gets typed arrays without
+parsing any text. frontend/src/utils/dataLoader.js reads the bundle.
+"""
+
+import json
+import os
+import sys
+
+BUNDLE_VERSION = 1
+
+# Buffers are aligned so every typed array view can be created without copying
+BUNDLE_ALIGNMENT = 8
+
+def get_code_dtype(dictionary_size):
+    """Smallest unsigned code type (numpy dtype, JS typed array name) for a dictionary"""
+    if dictionary_size <= 1 << 8:
+        return '<u1', 'Uint8Array'
+    if dictionary_size <= 1 << 16:
+        return '<u2', 'Uint16Array'
+    return '<u4', 'Uint32Array'
+
+def encode_bundle_column(series):
+    """
+    Encode one column as (numpy array, JS typed array name, dictionary or None)
+    
+    Numeric columns without missing values whose values are whole numbers within int32
+    become Int32; other numeric columns become Float64. Everything else is treated as
+    text and dictionary-encoded, with '' for missing values (as d3.csv would read them).
+    """
+    import numpy as np
+    import pandas as pd
+    from pandas.api.types import is_bool_dtype, is_numeric_dtype
+    
+    if is_numeric_dtype(series.dtype) and not is_bool_dtype(series.dtype):
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        finite = values[~np.isnan(values)]
+        is_integral = (
+            len(finite) == len(values)
+            and np.array_equal(finite, np.round(finite))
+            and (len(finite) == 0 or (finite.min() >= -2 ** 31 and finite.max() < 2 ** 31))
+        )
+        if is_integral:
+            return values.astype('<i4'), 'Int32Array', None
+        return values.astype('<f8'), 'Float64Array', None
+    
+    codes, uniques = pd.factorize(series.astype(object).fillna('').astype(str))
+    numpy_dtype, array_type = get_code_dtype(len(uniques))
+    return codes.astype(numpy_dtype), array_type, uniques.tolist()
+
+def write_dataset_bundle(df, header_path):
+    """
+    Write <name>.bundle.json and <name>.bundle.bin for a converted DataFrame
+    
+    Columns keep the order of the converted output (PersonUID first).
+    """
+    import numpy as np
+    
+    binary_path = os.path.splitext(header_path)[0] + '.bin'
+    header = {
+        'version': BUNDLE_VERSION,
+        'binary': os.path.basename(binary_path),
+        'row_count': len(df),
+        'columns': [],
+    }
+    byte_offset = 0
+    with open(binary_path, 'wb') as f:
+        for col in df.columns:
+            array, array_type, dictionary = encode_bundle_column(df[col])
+            padding = -byte_offset % BUNDLE_ALIGNMENT
+            f.write(b'\0' * padding)
+            byte_offset += padding
+            f.write(np.ascontiguousarray(array).tobytes())
+            column = {'name': str(col), 'type': array_type, 'byteOffset': byte_offset, 'length': len(array)}
+            if dictionary is not None:
+                column['dictionary'] = dictionary
+            header['columns'].append(column)
+            byte_offset += array.nbytes
+        header['byte_length'] = byte_offset
+    
+    with open(header_path, 'w', encoding='utf-8') as f:
+        json.dump(header, f, ensure_ascii=False, separators=(',', ':'))
+    return header
+
+def read_dataset_bundle(header_path):
+    """Read a bundle back into a DataFrame (text columns as categoricals)"""
+    import numpy as np
+    import pandas as pd
+    
+    with open(header_path, 'r', encoding='utf-8') as f:
+        header = json.load(f)
+    buffer = np.memmap(os.path.join(os.path.dirname(header_path), header['binary']), dtype=np.uint8, mode='r')
+    numpy_dtypes = {'Uint8Array': '<u1', 'Uint16Array': '<u2', 'Uint32Array': '<u4',
+                    'Int32Array': '<i4', 'Float64Array': '<f8'}
+    
+    columns = {}
+    for column in header['columns']:
+        dtype = np.dtype(numpy_dtypes[column['type']])
+        start = column['byteOffset']
+        values = buffer[start:start + column['length'] * dtype.itemsize].view(dtype)
+        if 'dictionary' in column:
+            columns[column['name']] = pd.Categorical.from_codes(values.astype(np.int64), column['dictionary'])
+        else:
+            columns[column['name']] = np.asarray(values)
+    return pd.DataFrame(columns)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python dataset_bundle.py output/<converted file>.csv|.parquet|.feather ...")
+        sys.exit(1)
+    from career_tables import load_converted_output
+    for converted_path in sys.argv[1:]:
+        header_path = os.path.splitext(converted_path)[0] + '.bundle.json'
+        header = write_dataset_bundle(load_converted_output(converted_path), header_path)
+        print(f"Wrote bundle ({header['row_count']} rows, {header['byte_length']} bytes): {header_path}")
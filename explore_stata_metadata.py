@@ -3,35 +3,100 @@
 Script to explore Stata file metadata and search for PersonID field
 """
 
-import pyreadstat
+import numpy as np
 import pandas as pd
-import sys
-import os
-import glob
-import subprocess
 
-def explore_stata_file(file_path):
+from stata_loader import install_questionary, load_stata_file, select_stata_file
+
+# Profiling modes for the potential ID column scan
+PROFILE_MODES = {
+    "Metadata only (fast, no data rows read)": None,
+    "Exact uniqueness profile": "exact",
+    "Approximate uniqueness profile (streamed, constant memory)": "approximate",
+}
+
+def profile_uniqueness_exact(file_path):
+    """
+    Unique ratio per column in one vectorised nunique pass over the projected columns
+    """
+    df, meta = load_stata_file(file_path)
+    # Only numeric and text columns can hold IDs
+    df = df.select_dtypes(include=['number', 'object', 'string'])
+    
+    counts = df.count()
+    unique_counts = df.nunique()
+    ratios = (unique_counts / counts.replace(0, np.nan)).dropna()
+    samples = {col: df[col].dropna().head(3).tolist() for col in ratios.index}
+    return ratios, samples
+
+def estimate_distinct_counts(file_path, chunksize=100000, k=4096):
+    """
+    Approximate distinct counts per column, streamed chunk by chunk
+    
+    Uses a k-minimum-values sketch: values are hashed to 64 bits and only the k smallest
+    distinct hashes are kept per column, so memory stays constant whatever the file size.
+    Returns (distinct estimates, non-null counts, sample values) per column.
+    """
+    import pyreadstat
+    
+    sketches = {}
+    counts = {}
+    samples = {}
+    reader = pyreadstat.read_file_in_chunks(pyreadstat.read_dta, file_path, chunksize=chunksize)
+    for df, _ in reader:
+        df = df.select_dtypes(include=['number', 'object', 'string'])
+        for col in df.columns:
+            values = df[col].dropna()
+            counts[col] = counts.get(col, 0) + len(values)
+            if col not in samples or len(samples[col]) < 3:
+                samples[col] = samples.get(col, []) + values.head(3 - len(samples.get(col, []))).tolist()
+            hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+            merged = np.unique(np.concatenate([sketches.get(col, np.array([], dtype=np.uint64)), hashes]))
+            sketches[col] = merged[:k]
+    
+    estimates = {}
+    for col, sketch in sketches.items():
+        if len(sketch) < k:
+            # Fewer than k distinct hashes seen: the sketch holds every distinct value
+            estimates[col] = len(sketch)
+        else:
+            estimates[col] = (k - 1) / (float(sketch[-1]) / 2.0 ** 64)
+    return pd.Series(estimates, dtype=float), pd.Series(counts, dtype=float), samples
+
+def profile_uniqueness_approximate(file_path, chunksize=100000):
+    """
+    Approximate unique ratio per column from a streamed distinct-count sketch
+    """
+    estimates, counts, samples = estimate_distinct_counts(file_path, chunksize)
+    ratios = (estimates / counts.replace(0, np.nan)).dropna().clip(upper=1.0)
+    return ratios, samples
+
+def explore_stata_file(file_path, profile_mode="exact"):
     """
     Comprehensive exploration of Stata file metadata
+    
+    Metadata questions are answered from a metadata-only read. profile_mode selects the
+    potential ID column scan: "exact", "approximate" or None to skip it.
     """
     print(f"Exploring Stata file: {file_path}\n")
     
     try:
-        # Read the Stata file with metadata
-        df, meta = pyreadstat.read_dta(file_path)
+        # Read only the Stata file metadata
+        _, meta = load_stata_file(file_path, metadataonly=True)
+        columns = meta.column_names
         
         print("=" * 80)
         print("FILE INFORMATION")
         print("=" * 80)
-        print(f"Number of rows: {len(df)}")
-        print(f"Number of columns: {len(df.columns)}")
+        print(f"Number of rows: {meta.number_rows}")
+        print(f"Number of columns: {len(columns)}")
         print(f"File label: {getattr(meta, 'file_label', 'Not available')}")
         print(f"File encoding: {getattr(meta, 'file_encoding', 'Not available')}")
         
         print("\n" + "=" * 80)
         print("ALL COLUMN NAMES")
         print("=" * 80)
-        for i, col in enumerate(df.columns):
+        for i, col in enumerate(columns):
             print(f"{i+1:3d}. {col}")
         
         print("\n" + "=" * 80)
@@ -54,7 +119,7 @@ def explore_stata_file(file_path):
         id_related = []
         number_related = []
         
-        for col in df.columns:
+        for col in columns:
             col_lower = col.lower()
             if 'person' in col_lower:
                 person_related.append(col)
@@ -102,21 +167,24 @@ def explore_stata_file(file_path):
         print("FIRST FEW ROWS OF DATA (to check for any ID-like columns)")
         print("=" * 80)
         # Look for columns that might contain IDs (numeric or alphanumeric patterns)
-        potential_id_cols = []
-        for col in df.columns:
-            if df[col].dtype in ['int64', 'float64', 'object']:
-                # Check if column has unique or mostly unique values (characteristic of IDs)
-                unique_ratio = len(df[col].dropna().unique()) / len(df[col].dropna())
-                if unique_ratio > 0.8:  # More than 80% unique values
-                    potential_id_cols.append((col, unique_ratio))
+        if profile_mode == "exact":
+            ratios, samples = profile_uniqueness_exact(file_path)
+        elif profile_mode == "approximate":
+            ratios, samples = profile_uniqueness_approximate(file_path)
+            print("(Approximate distinct counts from a streamed sketch)")
+        else:
+            ratios, samples = pd.Series(dtype=float), {}
+            print("Skipped (metadata-only mode)")
+        
+        # Check if column has unique or mostly unique values (characteristic of IDs)
+        potential_id_cols = ratios[ratios > 0.8]  # More than 80% unique values
         
-        if potential_id_cols:
+        if not potential_id_cols.empty:
             print("\nColumns with high uniqueness (potential ID columns):")
-            for col, ratio in sorted(potential_id_cols, key=lambda x: x[1], reverse=True)[:10]:
+            for col, ratio in potential_id_cols.sort_values(ascending=False).head(10).items():
                 print(f"  {col}: {ratio:.2%} unique values")
                 # Show sample values
-                sample_values = df[col].dropna().head(3).tolist()
-                print(f"    Sample values: {sample_values}")
+                print(f"    Sample values: {samples[col]}")
         
         print("\n" + "=" * 80)
         print("ADDITIONAL METADATA")
@@ -139,45 +207,14 @@ def explore_stata_file(file_path):
     print("=" * 80)
     print("Script completed. Check the output above for any PersonID-related fields.")
 
-def install_questionary():
-    """Install questionary if not available"""
-    try:
-        import questionary
-    except ImportError:
-        print("Installing questionary...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "questionary"])
-        import questionary
-    return questionary
-
-def select_stata_file():
-    """Let user select a .dta file from dta/ directory"""
-    dta_dir = "dta"
-    if not os.path.exists(dta_dir):
-        print(f"Directory {dta_dir}/ not found.")
-        return None
-    
-    dta_files = glob.glob(os.path.join(dta_dir, "*.dta"))
-    
-    if not dta_files:
-        print("No .dta files found in dta/ directory.")
-        return None
-    
-    questionary = install_questionary()
-    
-    file_choices = [os.path.basename(f) for f in dta_files]
-    selected = questionary.select(
-        "Select a .dta file to explore:",
-        choices=file_choices
-    ).ask()
-    
-    if not selected:
-        return None
-    
-    return os.path.join(dta_dir, selected)
-
 if __name__ == "__main__":
-    stata_file = select_stata_file()
+    stata_file = select_stata_file("Select a .dta file to explore:")
     if stata_file:
-        explore_stata_file(stata_file)
+        questionary = install_questionary()
+        mode_label = questionary.select(
+            "Select uniqueness profiling mode:",
+            choices=list(PROFILE_MODES)
+        ).ask()
+        explore_stata_file(stata_file, PROFILE_MODES.get(mode_label))
     else:
         print("No file selected. Exiting.")
\ No newline at end of file
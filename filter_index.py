@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Inverted index files for the frontend filters in getFilteredData
+
+For each filter column the converted rows are dictionary-encoded and every value gets a
+sorted list of row ids, so any filter combination becomes a sorted-list intersection.
+Text columns used with includes() matching also get a character n-gram index over their
+dictionary values.
+
+Two files are written side by side: a JSON header (<name>.index.json) describing every
+array, and a binary file (<name>.index.bin) holding the arrays as little-endian uint32.
+"""
+
+import json
+import os
+import sys
+
+# Columns filtered in dataStore.getFilteredData (PersonUID for lock and exclusion lists)
+INDEX_COLUMNS = ['地區', '官職一', '出身一', '旗分', '機構一', 'PersonUID']
+
+# Columns matched by substring, e.g. 官職一.includes('尚書')
+NGRAM_COLUMNS = ['官職一', '機構一']
+NGRAM_SIZES = (1, 2)
+
+FILTER_INDEX_VERSION = 1
+
+def build_inverted_index(series):
+    """
+    Dictionary values, offsets and row-id postings for one column
+    
+    Rows of values[i] are postings[offsets[i]:offsets[i + 1]], in ascending order.
+    Missing values are indexed under ''.
+    """
+    import numpy as np
+    import pandas as pd
+    
+    codes, uniques = pd.factorize(series.astype(object).fillna('').astype(str))
+    # A stable sort of the codes keeps row ids ascending within each value
+    postings = np.argsort(codes, kind='stable').astype(np.uint32)
+    counts = np.bincount(codes, minlength=len(uniques))
+    offsets = np.r_[0, np.cumsum(counts)].astype(np.uint32)
+    return uniques.tolist(), offsets, postings
+
+def build_ngram_index(values, sizes=NGRAM_SIZES):
+    """
+    Character n-grams of dictionary values -> sorted value codes
+    
+    A substring query is answered by intersecting the value lists of its n-grams,
+    checking the surviving candidates with a real substring test, and taking the
+    union of their row postings.
+    """
+    import numpy as np
+    
+    grams = {}
+    for code, value in enumerate(values):
+        seen = set()
+        for n in sizes:
+            for i in range(len(value) - n + 1):
+                gram = value[i:i + n]
+                if gram not in seen:
+                    seen.add(gram)
+                    grams.setdefault(gram, []).append(code)
+    gram_list = sorted(grams)
+    counts = np.array([len(grams[gram]) for gram in gram_list], dtype=np.int64)
+    offsets = np.r_[0, np.cumsum(counts)].astype(np.uint32)
+    codes = np.array([code for gram in gram_list for code in grams[gram]], dtype=np.uint32)
+    return gram_list, offsets, codes
+
+def write_filter_index(df, header_path):
+    """
+    Write the inverted index header and binary files for a converted DataFrame
+    
+    header_path is the .index.json path; the binary file sits next to it as .index.bin.
+    """
+    import numpy as np
+    
+    binary_path = os.path.splitext(header_path)[0] + '.bin'
+    header = {
+        'version': FILTER_INDEX_VERSION,
+        'binary': os.path.basename(binary_path),
+        'row_count': len(df),
+        'dtype': 'uint32',
+        'columns': {},
+        'ngrams': {},
+    }
+    byte_offset = 0
+    
+    def add_array(f, array):
+        nonlocal byte_offset
+        array = np.ascontiguousarray(array, dtype='<u4')
+        f.write(array.tobytes())
+        descriptor = {'byteOffset': byte_offset, 'length': int(len(array))}
+        byte_offset += array.nbytes
+        return descriptor
+    
+    with open(binary_path, 'wb') as f:
+        for col in INDEX_COLUMNS:
+            if col not in df.columns:
+                continue
+            values, offsets, postings = build_inverted_index(df[col])
+            header['columns'][col] = {
+                'values': values,
+                'offsets': add_array(f, offsets),
+                'postings': add_array(f, postings),
+            }
+            if col in NGRAM_COLUMNS:
+                grams, gram_offsets, gram_codes = build_ngram_index(values)
+                header['ngrams'][col] = {
+                    'sizes': list(NGRAM_SIZES),
+                    'grams': grams,
+                    'offsets': add_array(f, gram_offsets),
+                    'values': add_array(f, gram_codes),
+                }
+    
+    with open(header_path, 'w', encoding='utf-8') as f:
+        json.dump(header, f, ensure_ascii=False, separators=(',', ':'))
+    return header
+
+def load_filter_index(header_path):
+    """Load an index header and memory-map its binary arrays as numpy uint32 views"""
+    import numpy as np
+    
+    with open(header_path, 'r', encoding='utf-8') as f:
+        header = json.load(f)
+    buffer = np.memmap(os.path.join(os.path.dirname(header_path), header['binary']), dtype='<u4', mode='r')
+    
+    def view(descriptor):
+        start = descriptor['byteOffset'] // 4
+        return buffer[start:start + descriptor['length']]
+    
+    for section in ('columns', 'ngrams'):
+        for entry in header[section].values():
+            for key, descriptor in list(entry.items()):
+                if isinstance(descriptor, dict) and 'byteOffset' in descriptor:
+                    entry[key] = view(descriptor)
+    return header
+
+def lookup_rows(index, col, values):
+    """Sorted row ids whose column equals any of values"""
+    import numpy as np
+    
+    entry = index['columns'][col]
+    positions = {value: i for i, value in enumerate(entry['values'])}
+    offsets, postings = entry['offsets'], entry['postings']
+    parts = [postings[offsets[positions[value]]:offsets[positions[value] + 1]]
+             for value in values if value in positions]
+    if not parts:
+        return np.array([], dtype=np.uint32)
+    return parts[0].copy() if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+def lookup_substring_rows(index, col, substring):
+    """Sorted row ids whose column contains substring, via the n-gram index"""
+    import numpy as np
+    
+    entry = index['ngrams'][col]
+    values = index['columns'][col]['values']
+    n = min(len(substring), max(entry['sizes']))
+    if n == 0:
+        candidates = range(len(values))
+    else:
+        positions = {gram: i for i, gram in enumerate(entry['grams'])}
+        candidates = None
+        for i in range(len(substring) - n + 1):
+            gram = substring[i:i + n]
+            if gram not in positions:
+                return np.array([], dtype=np.uint32)
+            p = positions[gram]
+            codes = entry['values'][entry['offsets'][p]:entry['offsets'][p + 1]]
+            candidates = codes if candidates is None else np.intersect1d(candidates, codes, assume_unique=True)
+    matches = [values[code] for code in candidates if substring in values[code]]
+    return lookup_rows(index, col, matches)
+
+def intersect_rows(*row_lists):
+    """Intersection of sorted row-id arrays, smallest first"""
+    import numpy as np
+    
+    row_lists = sorted(row_lists, key=len)
+    result = row_lists[0]
+    for rows in row_lists[1:]:
+        result = np.intersect1d(result, rows, assume_unique=True)
+    return result
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python filter_index.py output/<converted file>.csv|.parquet|.feather ...")
+        sys.exit(1)
+    from career_tables import load_converted_output
+    for converted_path in sys.argv[1:]:
+        header_path = os.path.splitext(converted_path)[0] + '.index.json'
+        header = write_filter_index(load_converted_output(converted_path), header_path)
+        print(f"Wrote filter index for {len(header['columns'])} columns: {header_path}")
@@ -1,10 +1,17 @@
 import { defineStore } from 'pinia'
-import { ref, computed } from 'vue'
+import { ref, computed, shallowRef, markRaw } from 'vue'
 import * as d3 from 'd3'
+import { isBundleDataset, loadDatasetBundle, bundleToRows, lookupBundleRows, isShardedDataset, loadShardedDataset } from '../utils/dataLoader'
+import { loadFilterIndex, intersectSorted, lookupRows } from '../utils/filterIndex'
+
+// processedData 轉為數字的欄位（缺值為 0）
+const NUMERIC_COLUMNS = ['record_number', '陽曆年份', '季節號']
 
 export const useDataStore = defineStore('data', () => {
   // State
   const rawData = ref([])
+  const datasetBundle = shallowRef(null) // 以 .bundle.json 載入時的欄位陣列，篩選時直接讀取
+  const filterIndex = shallowRef(null) // 與數據集同名的 .index.json（filter_index.py 產生），選用
   const availableDatasets = ref([])
   const currentDataset = ref('')
   const loading = ref(false)
@@ -26,6 +33,8 @@ export const useDataStore = defineStore('data', () => {
   // Computed
   const processedData = computed(() => {
     if (!rawData.value.length) return []
+    // 欄式數據集的記錄視圖已將 NUMERIC_COLUMNS 讀為數字，不需複製
+    if (datasetBundle.value) return rawData.value
     
     return rawData.value.map(d => ({
       ...d,
@@ -93,7 +102,8 @@ export const useDataStore = defineStore('data', () => {
     }
   }
 
-  const loadDataset = async (filename) => {
+  // yearRange: { firstYear, lastYear }，只用於分年數據集（只下載與範圍重疊的分片）
+  const loadDataset = async (filename, { firstYear = null, lastYear = null } = {}) => {
     loading.value = true
     error.value = null
     
@@ -101,9 +111,41 @@ export const useDataStore = defineStore('data', () => {
       // 手動拼接 base 路徑
       const basePath = import.meta.env.BASE_URL || '/'
       const csvPath = `${basePath}${filename}`
-      console.log('Loading CSV from:', csvPath)
       
-      const data = await d3.csv(csvPath)
+      let data
+      let bundle = null
+      if (isBundleDataset(filename)) {
+        // 二進位數據集：保留 TypedArray 欄位，記錄只是讀取欄位的視圖
+        console.log('Loading bundle from:', csvPath)
+        bundle = await loadDatasetBundle(csvPath)
+        data = markRaw(bundleToRows(bundle, NUMERIC_COLUMNS))
+      } else if (isShardedDataset(filename)) {
+        // 分年數據集：依 manifest 只載入年份範圍內的分片
+        console.log('Loading shards from:', csvPath, firstYear, lastYear)
+        data = await loadShardedDataset(csvPath, firstYear, lastYear)
+      } else {
+        console.log('Loading CSV from:', csvPath)
+        data = await d3.csv(csvPath)
+      }
+      
+      // 篩選索引為選用：不存在、載入失敗或列數不符時照常逐筆篩選
+      // 分年數據集只載入部分分片，列號與完整數據集的索引不對應
+      let index = null
+      if (!isShardedDataset(filename)) {
+        const indexPath = csvPath.replace(/\.(csv|bundle\.json)$/, '.index.json')
+        try {
+          index = await loadFilterIndex(indexPath)
+          if (index.rowCount !== data.length) {
+            console.warn(`篩選索引列數 (${index.rowCount}) 與數據集 (${data.length}) 不符，不使用索引`)
+            index = null
+          }
+        } catch (err) {
+          index = null
+        }
+      }
+      
+      datasetBundle.value = bundle
+      filterIndex.value = index
       rawData.value = data
       currentDataset.value = filename
       console.log(`已載入數據集: ${filename}, 共 ${data.length} 筆記錄`)
@@ -358,6 +400,69 @@ export const useDataStore = defineStore('data', () => {
     return currentDatasetFilters.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp))
   }
 
+  // 精確比對的篩選條件各自查出已排序的列號再取交集，不逐筆比對記錄
+  // 列號來源依序為篩選索引的倒排清單、欄式數據集的字典代碼；沒有來源或含 destinationGroup（模糊比對）時回傳 null，改走逐筆篩選
+  const lookupRowIds = (col, values) => {
+    if (filterIndex.value?.columns[col]) return lookupRows(filterIndex.value, col, values)
+    if (datasetBundle.value) return lookupBundleRows(datasetBundle.value, col, values)
+    return null
+  }
+
+  const selectRowIds = (criteria) => {
+    if (criteria.destinationGroup) return null
+    
+    const conditions = []
+    if (criteria.region) conditions.push(['地區', [criteria.region]])
+    
+    if (criteria.position) {
+      conditions.push(['官職一', [criteria.position]])
+    } else if (criteria.originalValuesList && criteria.fieldType === 'position') {
+      conditions.push(['官職一', criteria.originalValuesList])
+    }
+    
+    if (criteria.background || criteria.origin) {
+      conditions.push(['出身一', [criteria.background || criteria.origin]])
+    } else if (criteria.originalValuesList && criteria.fieldType === 'origin') {
+      conditions.push(['出身一', criteria.originalValuesList])
+    } else if (criteria.originGroup || criteria.backgroundGroup) {
+      conditions.push(['出身一', (criteria.originGroup || criteria.backgroundGroup).items])
+    }
+    
+    if (criteria.banner) {
+      conditions.push(['旗分', [criteria.banner]])
+    } else if (criteria.bannerGroup) {
+      conditions.push(['旗分', criteria.bannerGroup.items])
+    }
+    
+    if (criteria.institution) {
+      conditions.push(['機構一', [criteria.institution]])
+    } else if (criteria.institutionGroup) {
+      conditions.push(['機構一', criteria.institutionGroup.items])
+    } else if (criteria.originalValuesList && criteria.fieldType === 'institution') {
+      conditions.push(['機構一', criteria.originalValuesList])
+    }
+    
+    if (!conditions.length) return null
+    
+    let rowIds = null
+    for (const [col, values] of conditions) {
+      const rows = lookupRowIds(col, values)
+      if (rows === null) return null
+      rowIds = rowIds === null ? rows : intersectSorted(rowIds, rows)
+    }
+    return rowIds
+  }
+
+  // 處理排除的官員UID列表
+  const excludePersonUIDs = (filtered, criteria) => {
+    if (!criteria.excludedPersonUIDs || criteria.excludedPersonUIDs.length === 0) return filtered
+    
+    const excluded = new Set(criteria.excludedPersonUIDs)
+    const result = filtered.filter(d => !excluded.has(d.PersonUID))
+    console.log(`📊 Excluded PersonUIDs filter: ${filtered.length} -> ${result.length} records (excluded ${criteria.excludedPersonUIDs.length} UIDs)`)
+    return result
+  }
+
   const getFilteredData = (criteria) => {
     console.log('🔍 getFilteredData called with criteria:', criteria)
     
@@ -376,6 +481,13 @@ export const useDataStore = defineStore('data', () => {
       return getFilteredDataForSankeyNode(criteria)
     }
     
+    const rowIds = selectRowIds(criteria)
+    if (rowIds) {
+      filtered = excludePersonUIDs(Array.from(rowIds, i => filtered[i]), criteria)
+      console.log(`✅ Final filter result (row ids): ${originalCount} -> ${filtered.length} records`)
+      return filtered
+    }
+    
     // 添加快速測試：統計包含"尚書"的記錄數
     if (criteria.destinationGroup && criteria.destinationGroup.name.includes('尚書')) {
       const shangShuCount = filtered.filter(d => d.官職一 && d.官職一.includes('尚書')).length
@@ -523,12 +635,7 @@ export const useDataStore = defineStore('data', () => {
       console.log(`📊 Institution group filter "${criteria.destinationGroup.name}": ${beforeCount} -> ${filtered.length} records`)
     }
     
-    // 處理排除的官員UID列表
-    if (criteria.excludedPersonUIDs && criteria.excludedPersonUIDs.length > 0) {
-      const beforeCount = filtered.length
-      filtered = filtered.filter(d => !criteria.excludedPersonUIDs.includes(d.PersonUID))
-      console.log(`📊 Excluded PersonUIDs filter: ${beforeCount} -> ${filtered.length} records (excluded ${criteria.excludedPersonUIDs.length} UIDs)`)
-    }
+    filtered = excludePersonUIDs(filtered, criteria)
     
     console.log(`✅ Final filter result: ${originalCount} -> ${filtered.length} records`)
     return filtered
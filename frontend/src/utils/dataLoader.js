@@ -1,3 +1,5 @@
+import * as d3 from 'd3'
+
 // 為生產環境建立簡易的數據載入API
 export const scanDatasets = async () => {
   try {
@@ -14,4 +16,127 @@ export const scanDatasets = async () => {
     'CGED-Q Public Release 1760-1798  1 Jul 2024.csv',
     'CGED-Q Public Release 1850-1864 19 Apr 2022.csv'
   ]
-}
\ No newline at end of file
+}
+
+// 載入 dataset_bundle.py 產生的二進位數據集（.bundle.json + .bundle.bin）
+export const isBundleDataset = (filename) => filename.endsWith('.bundle.json')
+
+const TYPED_ARRAYS = {
+  Uint8Array,
+  Uint16Array,
+  Uint32Array,
+  Int32Array,
+  Float64Array
+}
+
+/**
+ * 載入欄式二進位數據集
+ * - 每個欄位直接以 TypedArray 視圖讀取二進位緩衝區，不需解析文字
+ * - 文字欄位為字典編碼，相同的值共用同一個字串
+ */
+export const loadDatasetBundle = async (headerUrl) => {
+  const headerResponse = await fetch(headerUrl)
+  if (!headerResponse.ok) throw new Error(`無法載入數據集: ${headerUrl}`)
+  const header = await headerResponse.json()
+  
+  // 二進位檔與 header 同名（build 時的 link-csv 會一併去除檔名空白）
+  const binaryUrl = headerUrl.replace(/\.json$/, '.bin')
+  const binaryResponse = await fetch(binaryUrl)
+  if (!binaryResponse.ok) throw new Error(`無法載入數據集資料: ${binaryUrl}`)
+  const buffer = await binaryResponse.arrayBuffer()
+  
+  const columns = header.columns.map(column => ({
+    name: column.name,
+    dictionary: column.dictionary || null,
+    values: new TYPED_ARRAYS[column.type](buffer, column.byteOffset, column.length)
+  }))
+  
+  return { rowCount: header.row_count, columns }
+}
+
+/**
+ * 欄式數據集的記錄視圖（與 d3.csv 的記錄相容，數值欄位已是數字）
+ * - 每筆記錄只保存列號，讀取欄位時才從 TypedArray 取值、文字欄位查字典，不會為每列每欄建立物件屬性
+ * - 展開（{...d}）、Object.keys、JSON.stringify 仍可使用
+ * - zeroFilled 中的數值欄位缺值（NaN）時為 0，與 processedData 的 +d.x || 0 一致；其他數值欄位缺值為 ''
+ */
+export const bundleToRows = (bundle, zeroFilled = []) => {
+  const columns = new Map(bundle.columns.map(column => [column.name, column]))
+  const names = bundle.columns.map(column => column.name)
+  const zeroFilledSet = new Set(zeroFilled)
+  
+  const read = (row, name) => {
+    const column = columns.get(name)
+    const value = column.values[row]
+    if (column.dictionary) return column.dictionary[value]
+    if (Number.isNaN(value)) return zeroFilledSet.has(name) ? 0 : ''
+    return value
+  }
+  
+  const handler = {
+    get: (target, key) => {
+      // Vue 不為記錄視圖建立響應式代理
+      if (key === '__v_skip') return true
+      return columns.has(key) ? read(target.row, key) : undefined
+    },
+    has: (target, key) => columns.has(key),
+    ownKeys: () => names,
+    getOwnPropertyDescriptor: (target, key) => columns.has(key)
+      ? { value: read(target.row, key), writable: false, enumerable: true, configurable: true }
+      : undefined
+  }
+  
+  return Array.from({ length: bundle.rowCount }, (_, row) => new Proxy({ row }, handler))
+}
+
+/**
+ * 文字欄位等於任一指定值的列號（已排序），直接掃描字典代碼
+ * - 欄位不存在或不是字典編碼時回傳 null
+ */
+export const lookupBundleRows = (bundle, col, values) => {
+  const column = bundle.columns.find(c => c.name === col)
+  if (!column || !column.dictionary) return null
+  
+  const wanted = new Set(values)
+  const matches = new Uint8Array(column.dictionary.length)
+  column.dictionary.forEach((value, code) => {
+    if (wanted.has(value)) matches[code] = 1
+  })
+  
+  const rows = []
+  for (let i = 0; i < column.values.length; i++) {
+    if (matches[column.values[i]]) rows.push(i)
+  }
+  return Uint32Array.from(rows)
+}
+
+// 載入 year_shards.py 產生的分年數據集（.shards.json + 每年一個 CSV）
+export const isShardedDataset = (filename) => filename.endsWith('.shards.json')
+
+/**
+ * 載入分年數據集
+ * - 只下載陽曆年份範圍與 [firstYear, lastYear] 重疊的分片（未指定則全部）
+ * - 分片檔名由 manifest 檔名推得（<name>.shards.json → <name>.<key>.csv），與 link-csv 去除空白後一致
+ */
+export const loadShardedDataset = async (manifestUrl, firstYear = null, lastYear = null) => {
+  const manifestResponse = await fetch(manifestUrl)
+  if (!manifestResponse.ok) throw new Error(`無法載入數據集: ${manifestUrl}`)
+  const manifest = await manifestResponse.json()
+  
+  const shards = manifest.shards.filter(shard => {
+    if (firstYear === null && lastYear === null) return true
+    const range = shard.ranges[manifest.partition_column]
+    if (!range) return false
+    return (firstYear === null || range[1] >= firstYear) && (lastYear === null || range[0] <= lastYear)
+  })
+  
+  const parts = await Promise.all(shards.map(shard =>
+    d3.csv(manifestUrl.replace(/\.shards\.json$/, `.${shard.key}.csv`))
+  ))
+  const records = parts.flat()
+  if (firstYear === null && lastYear === null) return records
+  return records.filter(d => {
+    const year = +d[manifest.partition_column]
+    return (firstYear === null || year >= firstYear) && (lastYear === null || year <= lastYear)
+  })
+}
@@ -0,0 +1,113 @@
+// 篩選索引工具函數（讀取 filter_index.py 產生的 .index.json / .index.bin）
+
+/**
+ * 載入篩選索引
+ * - header 為 JSON，描述每個陣列在二進位檔中的位置
+ * - 二進位檔為 little-endian uint32，直接建立 Uint32Array 視圖，不複製資料
+ */
+export const loadFilterIndex = async (headerUrl) => {
+  const headerResponse = await fetch(headerUrl)
+  if (!headerResponse.ok) throw new Error(`無法載入索引: ${headerUrl}`)
+  const header = await headerResponse.json()
+  
+  // 二進位檔與 header 同名（.index.json → .index.bin）
+  const binaryUrl = headerUrl.replace(/\.json$/, '.bin')
+  const binaryResponse = await fetch(binaryUrl)
+  if (!binaryResponse.ok) throw new Error(`無法載入索引資料: ${binaryUrl}`)
+  const buffer = await binaryResponse.arrayBuffer()
+  
+  const view = (descriptor) => new Uint32Array(buffer, descriptor.byteOffset, descriptor.length)
+  
+  const columns = {}
+  Object.entries(header.columns).forEach(([col, entry]) => {
+    columns[col] = {
+      values: entry.values,
+      valueIndex: new Map(entry.values.map((value, i) => [value, i])),
+      offsets: view(entry.offsets),
+      postings: view(entry.postings)
+    }
+  })
+  
+  const ngrams = {}
+  Object.entries(header.ngrams || {}).forEach(([col, entry]) => {
+    ngrams[col] = {
+      sizes: entry.sizes,
+      gramIndex: new Map(entry.grams.map((gram, i) => [gram, i])),
+      offsets: view(entry.offsets),
+      values: view(entry.values)
+    }
+  })
+  
+  return { rowCount: header.row_count, columns, ngrams }
+}
+
+/**
+ * 兩個已排序陣列的交集
+ */
+export const intersectSorted = (a, b) => {
+  const result = []
+  let i = 0
+  let j = 0
+  while (i < a.length && j < b.length) {
+    if (a[i] === b[j]) {
+      result.push(a[i])
+      i++
+      j++
+    } else if (a[i] < b[j]) {
+      i++
+    } else {
+      j++
+    }
+  }
+  return Uint32Array.from(result)
+}
+
+/**
+ * 欄位值等於任一指定值的記錄編號（已排序）
+ */
+export const lookupRows = (index, col, values) => {
+  const entry = index.columns[col]
+  if (!entry) return new Uint32Array(0)
+  
+  const parts = []
+  values.forEach(value => {
+    const i = entry.valueIndex.get(value)
+    if (i !== undefined) {
+      parts.push(entry.postings.subarray(entry.offsets[i], entry.offsets[i + 1]))
+    }
+  })
+  if (parts.length === 1) return parts[0]
+  
+  const total = parts.reduce((sum, part) => sum + part.length, 0)
+  const merged = new Uint32Array(total)
+  let offset = 0
+  parts.forEach(part => {
+    merged.set(part, offset)
+    offset += part.length
+  })
+  return merged.sort()
+}
+
+/**
+ * 欄位值包含指定字串的記錄編號（已排序），對應 includes('尚書') 式的比對
+ */
+export const lookupSubstringRows = (index, col, substring) => {
+  const entry = index.ngrams[col]
+  const values = index.columns[col]?.values || []
+  if (!entry) {
+    return lookupRows(index, col, values.filter(value => value.includes(substring)))
+  }
+  
+  const n = Math.min(substring.length, Math.max(...entry.sizes))
+  let candidates = null
+  for (let i = 0; i + n <= substring.length && n > 0; i++) {
+    const g = entry.gramIndex.get(substring.slice(i, i + n))
+    if (g === undefined) return new Uint32Array(0)
+    const codes = entry.values.subarray(entry.offsets[g], entry.offsets[g + 1])
+    candidates = candidates === null ? codes : intersectSorted(candidates, codes)
+  }
+  
+  const codes = candidates === null ? values.map((_, i) => i) : Array.from(candidates)
+  const matches = codes.map(code => values[code]).filter(value => value.includes(substring))
+  return lookupRows(index, col, matches)
+}
@@ -0,0 +1,45 @@
+// 本機查詢服務（query_server.py）的用戶端
+// 服務為選用：未啟動時 isQueryServerAvailable 回傳 false，前端照常使用完整數據
+const DEFAULT_SERVER_URL = 'http://127.0.0.1:8765'
+
+const request = async (path, { method = 'GET', body, serverUrl = DEFAULT_SERVER_URL } = {}) => {
+  const response = await fetch(`${serverUrl}${path}`, {
+    method,
+    headers: body ? { 'Content-Type': 'application/json' } : undefined,
+    body: body ? JSON.stringify(body) : undefined
+  })
+  const result = await response.json()
+  if (!response.ok) throw new Error(result.error || `查詢失敗: ${response.status}`)
+  return result
+}
+
+export const isQueryServerAvailable = async (serverUrl = DEFAULT_SERVER_URL) => {
+  try {
+    await request('/info', { serverUrl })
+    return true
+  } catch (error) {
+    return false
+  }
+}
+
+/**
+ * 篩選記錄
+ * - filters: { 欄位: [值, ...] }，contains: { 官職一: '尚書' }
+ * - lock: 鎖定名單編號，person_uids / exclude_person_uids: PersonUID 清單
+ * - columns 只回傳圖表需要的欄位，offset/limit 分頁
+ */
+export const queryRecords = (query, serverUrl) => request('/filter', { method: 'POST', body: query, serverUrl })
+
+// 分組計數；distinct: 'PersonUID' 時計算官員人數
+export const queryAggregate = (query, serverUrl) => request('/aggregate', { method: 'POST', body: query, serverUrl })
+
+// 鎖定名單只查一次，之後的查詢以 lock 編號引用
+export const lockPersonList = (personUIDs, source = '', serverUrl) =>
+  request('/locks', { method: 'POST', body: { person_uids: Array.from(personUIDs), source }, serverUrl })
+
+export const unlockPersonList = (lockId, serverUrl) =>
+  request(`/locks/${encodeURIComponent(lockId)}`, { method: 'DELETE', serverUrl })
+
+// 與 dataStore.getOfficialsByPersonUID 相同：按 record_number 排序的單一官員記錄
+export const queryOfficialsByPersonUID = (personUID, serverUrl) =>
+  request(`/officials/${encodeURIComponent(personUID)}`, { serverUrl })
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Record linkage on top of PersonUID: blocking plus career-continuity scoring
+
+PersonUID hashes 姓名|身份二|旗分|出身一, so one official splits into several PersonUIDs
+when 出身一 or 身份二 is recorded inconsistently across editions, while namesakes with
+identical fields share one PersonUID. This module treats every PersonUID as a career
+fragment and blocks fragments by name and origin (姓名, 原籍省, 原籍縣), so only fragments
+within the same block are compared and the work stays near-linear. Pairs are scored by
+temporal continuity across (陽曆年份, 季節號): careers that never appear in the same edition
+and follow on from each other are likely one person. Linked fragments share a stable
+LinkedPersonID (the PersonUID of their longest fragment) with a confidence score.
+"""
+
+import os
+import sys
+
+# Columns that define a blocking key; fragments are only compared within a block
+BLOCK_COLUMNS = ['姓名', '原籍省', '原籍縣']
+
+# Pairs scoring at least this are linked
+LINK_THRESHOLD = 0.5
+
+# Gap between fragments (in seasons) at which continuity falls to 1/e
+GAP_SCALE_SEASONS = 40
+
+# Each edition in which both fragments appear multiplies the score by this
+SHARED_EDITION_PENALTY = 0.5
+
+# Blocks with more fragments than this are too ambiguous to link (and would be quadratic)
+MAX_BLOCK_SIZE = 50
+
+SEASONS_PER_YEAR = 4
+
+def get_time_slots(df):
+    """Edition index per record: 陽曆年份 * 4 + (季節號 - 1), 0 where unknown"""
+    import numpy as np
+    import pandas as pd
+    
+    year = df['陽曆年份'].fillna(0).astype(np.int64) if '陽曆年份' in df.columns else pd.Series(0, index=df.index)
+    season = (df['季節號'].fillna(1).astype(np.int64).clip(lower=1) if '季節號' in df.columns
+              else pd.Series(1, index=df.index))
+    return (year * SEASONS_PER_YEAR + season - 1).to_numpy()
+
+def build_fragments(df):
+    """
+    One row per PersonUID with its blocking key, attributes and time span
+    
+    Also returns the records reduced to distinct (PersonUID, slot) pairs, and a
+    per-fragment confidence: the share of its editions in which it appears only once
+    (a PersonUID appearing twice in one edition is probably two namesakes).
+    """
+    import pandas as pd
+    from career_tables import text_column
+    
+    records = pd.DataFrame({
+        'PersonUID': df['PersonUID'].astype(str).to_numpy(),
+        '姓名': text_column(df, '姓') + text_column(df, '名'),
+        '原籍省': text_column(df, '原籍省'),
+        '原籍縣': text_column(df, '原籍縣'),
+        '旗分': text_column(df, '旗分'),
+        '出身一': text_column(df, '出身一'),
+        '身份二': text_column(df, '身份二'),
+        'slot': get_time_slots(df),
+    })
+    
+    grouped = records.groupby('PersonUID', sort=True)
+    fragments = grouped.agg(
+        records=('slot', 'size'),
+        first_slot=('slot', 'min'),
+        last_slot=('slot', 'max'),
+        slots=('slot', 'nunique'),
+        姓名=('姓名', 'first'),
+        旗分=('旗分', 'first'),
+        出身一=('出身一', 'first'),
+        身份二=('身份二', 'first'),
+    )
+    # Origin can vary inside a fragment (namesakes); block on the most frequent one
+    for col in ['原籍省', '原籍縣']:
+        counts = records.groupby(['PersonUID', col], sort=False).size().rename('n').reset_index()
+        modal = counts.sort_values(['PersonUID', 'n'], ascending=[True, False]).drop_duplicates('PersonUID')
+        fragments[col] = modal.set_index('PersonUID')[col]
+    fragments['confidence'] = fragments['slots'] / fragments['records']
+    
+    slots = records[['PersonUID', 'slot']].drop_duplicates()
+    return fragments.reset_index(), slots
+
+def score_candidate_pairs(fragments, slots):
+    """
+    Candidate fragment pairs within each block, with a continuity score
+    
+    score = continuity * conflict * attribute agreement, where continuity decays with the
+    gap between the two careers (1 when they interleave), conflict is
+    SHARED_EDITION_PENALTY per edition in which both fragments appear (one official is
+    listed once per edition), and attribute agreement penalises a differing 旗分 strongly
+    and differing 出身一/身份二 mildly.
+    """
+    import numpy as np
+    
+    block_sizes = fragments.groupby(BLOCK_COLUMNS, sort=False)['PersonUID'].transform('size')
+    candidates = fragments[(block_sizes > 1) & (block_sizes <= MAX_BLOCK_SIZE)]
+    pairs = candidates.merge(candidates, on=BLOCK_COLUMNS, suffixes=('_a', '_b'))
+    pairs = pairs[pairs['PersonUID_a'] < pairs['PersonUID_b']].reset_index(drop=True)
+    if pairs.empty:
+        return pairs.assign(shared_slots=0, score=0.0)
+    
+    # Editions shared by both fragments, counted with a join on (pair, slot)
+    pair_slots = pairs[['PersonUID_a', 'PersonUID_b']]
+    shared = (
+        pair_slots.merge(slots.rename(columns={'PersonUID': 'PersonUID_a'}), on='PersonUID_a')
+        .merge(slots.rename(columns={'PersonUID': 'PersonUID_b'}), on=['PersonUID_b', 'slot'])
+        .groupby(['PersonUID_a', 'PersonUID_b']).size().rename('shared_slots')
+    )
+    pairs = pairs.merge(shared, left_on=['PersonUID_a', 'PersonUID_b'], right_index=True, how='left')
+    pairs['shared_slots'] = pairs['shared_slots'].fillna(0).astype(np.int64)
+    
+    gap = np.maximum(pairs['first_slot_b'] - pairs['last_slot_a'], pairs['first_slot_a'] - pairs['last_slot_b'])
+    continuity = np.exp(-np.clip(gap - 1, 0, None) / GAP_SCALE_SEASONS)
+    conflict = SHARED_EDITION_PENALTY ** pairs['shared_slots']
+    agreement = (
+        np.where(pairs['旗分_a'] == pairs['旗分_b'], 1.0, 0.3)
+        * np.where(pairs['出身一_a'] == pairs['出身一_b'], 1.0, 0.9)
+        * np.where(pairs['身份二_a'] == pairs['身份二_b'], 1.0, 0.9)
+    )
+    pairs['score'] = continuity * conflict * agreement
+    return pairs
+
+def link_fragments(fragments, pairs, threshold=LINK_THRESHOLD):
+    """
+    Union linked fragments; returns PersonUID -> (LinkedPersonID, LinkConfidence)
+    
+    The LinkedPersonID of a cluster is the PersonUID of its fragment with the most
+    records (ties broken by earliest appearance, then PersonUID), so unlinked fragments
+    keep their PersonUID and IDs do not change between runs on the same data.
+    The confidence is the lowest link score or fragment confidence in the cluster.
+    """
+    import pandas as pd
+    
+    parent = {}
+    
+    def find(uid):
+        root = uid
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while parent.get(uid, uid) != root:
+            parent[uid], uid = root, parent[uid]
+        return root
+    
+    links = pairs[pairs['score'] >= threshold]
+    for uid_a, uid_b in zip(links['PersonUID_a'], links['PersonUID_b']):
+        root_a, root_b = find(uid_a), find(uid_b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+    
+    result = fragments[['PersonUID', 'records', 'first_slot', 'confidence']].copy()
+    result['cluster'] = [find(uid) for uid in result['PersonUID']]
+    
+    # Representative fragment per cluster
+    ranked = result.sort_values(['cluster', 'records', 'first_slot', 'PersonUID'],
+                                ascending=[True, False, True, True])
+    representatives = ranked.drop_duplicates('cluster').set_index('cluster')['PersonUID']
+    result['LinkedPersonID'] = result['cluster'].map(representatives)
+    
+    cluster_confidence = result.groupby('cluster')['confidence'].min()
+    if not links.empty:
+        link_clusters = pd.Series([find(uid) for uid in links['PersonUID_a']], index=links.index)
+        cluster_confidence = pd.concat([cluster_confidence, links['score'].groupby(link_clusters).min()]) \
+            .groupby(level=0).min()
+    result['LinkConfidence'] = result['cluster'].map(cluster_confidence).round(4)
+    return result[['PersonUID', 'LinkedPersonID', 'LinkConfidence']]
+
+def resolve_persons(df, threshold=LINK_THRESHOLD):
+    """
+    Link PersonUIDs of a converted DataFrame (one or several releases concatenated)
+    
+    Returns one row per PersonUID: LinkedPersonID, LinkConfidence, record count and
+    year span.
+    """
+    fragments, slots = build_fragments(df)
+    pairs = score_candidate_pairs(fragments, slots)
+    linkage = link_fragments(fragments, pairs, threshold)
+    linkage = linkage.merge(fragments[['PersonUID', '姓名', 'records', 'first_slot', 'last_slot']], on='PersonUID')
+    linkage['first_year'] = linkage.pop('first_slot') // SEASONS_PER_YEAR
+    linkage['last_year'] = linkage.pop('last_slot') // SEASONS_PER_YEAR
+    return linkage
+
+def write_person_linkage(df, output_path):
+    """Write the PersonUID -> LinkedPersonID table as CSV with BOM"""
+    linkage = resolve_persons(df)
+    with open(output_path, 'w', encoding='utf-8-sig') as f:
+        linkage.to_csv(f, index=False)
+    return linkage
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python person_linkage.py output/<converted file>.csv [more files ...]")
+        print("Several files (e.g. both releases) are linked together into output/person_linkage.csv")
+        sys.exit(1)
+    import pandas as pd
+    from career_tables import load_converted_output
+    
+    converted_paths = sys.argv[1:]
+    usecols = ['PersonUID', '姓', '名', '原籍省', '原籍縣', '旗分', '出身一', '身份二', '陽曆年份', '季節號']
+    frames = []
+    for path in converted_paths:
+        frame = load_converted_output(path)
+        frames.append(frame[[col for col in usecols if col in frame.columns]])
+    df = pd.concat(frames, ignore_index=True)
+    
+    if len(converted_paths) == 1:
+        output_path = os.path.splitext(converted_paths[0])[0] + '.linkage.csv'
+    else:
+        output_path = os.path.join(os.path.dirname(converted_paths[0]), 'person_linkage.csv')
+    linkage = write_person_linkage(df, output_path)
+    merged = (linkage['PersonUID'] != linkage['LinkedPersonID']).sum()
+    print(f"Linked {len(linkage)} PersonUIDs into {linkage['LinkedPersonID'].nunique()} persons "
+          f"({merged} PersonUIDs merged): {output_path}")
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Optional local query server over a converted dataset
+
+Instead of loading the whole CSV into the browser, the frontend can ask this server for
+only the rows or counts a chart needs. The dataset is read once from a converted file
+(Parquet or Feather preferred, CSV works) and filtered through the inverted index of
+filter_index.py, which is cached as <name>.index.json/.bin next to the file and rebuilt
+when the file is newer. Requests are served by asyncio and each query runs in a worker
+thread, so several charts can query at once.
+
+Endpoints (JSON in, JSON out):
+    GET    /info                  row and person counts, columns
+    POST   /filter                matching rows ({"filters", "contains", "lock", "person_uids",
+                                  "exclude_person_uids", "columns", "offset", "limit"})
+    POST   /aggregate             counts per group (the filter keys plus "group_by", "distinct")
+    POST   /locks                 lock a list ({"person_uids"}) -> {"lock": id, ...}
+    DELETE /locks/<id>            unlock
+    GET    /officials/<PersonUID> one official's records in record_number order
+
+A lock replaces refiltering the whole array on every lock (effectiveData): its rows are
+looked up once in the PersonUID index and later queries with "lock" only intersect them.
+
+Usage:
+    python query_server.py output/<converted file>.parquet [--host 127.0.0.1] [--port 8765]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+from urllib.parse import unquote
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+DEFAULT_LIMIT = 10000
+
+# Largest accepted request body
+MAX_BODY_BYTES = 16 << 20
+
+HTTP_REASONS = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class QueryError(Exception):
+    """A query that cannot be answered; reported to the client with its HTTP status"""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def load_or_build_index(converted_path, df):
+    """Load the cached filter index for a converted file, rebuilding it if missing or stale"""
+    from filter_index import load_filter_index, write_filter_index
+    
+    header_path = os.path.splitext(converted_path)[0] + '.index.json'
+    binary_path = os.path.splitext(header_path)[0] + '.bin'
+    if (not os.path.exists(header_path) or not os.path.exists(binary_path)
+            or os.path.getmtime(header_path) < os.path.getmtime(converted_path)):
+        print(f"Building filter index: {header_path}")
+        write_filter_index(df, header_path)
+    index = load_filter_index(header_path)
+    if index['row_count'] != len(df):
+        print(f"Filter index is out of date, rebuilding: {header_path}")
+        write_filter_index(df, header_path)
+        index = load_filter_index(header_path)
+    return index
+
+class QueryDataset:
+    """A converted dataset with its filter index, lock lists and query methods"""
+    
+    def __init__(self, converted_path):
+        import numpy as np
+        from career_tables import load_converted_output
+        
+        self.path = converted_path
+        self.df = load_converted_output(converted_path)
+        self.index = load_or_build_index(converted_path, self.df)
+        self.all_rows = np.arange(len(self.df), dtype=np.uint32)
+        self.locks = {}
+        self._lock_ids = itertools.count(1)
+    
+    @staticmethod
+    def get_list(query, key, name=None):
+        """A list-valued query entry; a scalar would otherwise be iterated character by character"""
+        values = query.get(key)
+        if values is not None and not isinstance(values, list):
+            raise QueryError(f"{name or key} must be a list of values, got {type(values).__name__}")
+        return values
+    
+    def person_rows(self, person_uids):
+        """Sorted row ids of the given PersonUIDs"""
+        from filter_index import lookup_rows
+        
+        return lookup_rows(self.index, 'PersonUID', [str(uid) for uid in person_uids])
+    
+    def select_rows(self, query):
+        """
+        Sorted row ids matching a query's filters, substring filters and person lists
+        
+        Filter values are lists; missing values are matched by '' (as indexed).
+        """
+        import numpy as np
+        from filter_index import intersect_rows, lookup_rows, lookup_substring_rows
+        
+        row_lists = []
+        for col, values in (query.get('filters') or {}).items():
+            if col not in self.index['columns']:
+                raise QueryError(f"Column {col!r} is not indexed")
+            if not isinstance(values, list):
+                raise QueryError(f"filters[{col!r}] must be a list of values, got {type(values).__name__}")
+            row_lists.append(lookup_rows(self.index, col, [str(value) for value in values]))
+        for col, substring in (query.get('contains') or {}).items():
+            if col not in self.index['ngrams']:
+                raise QueryError(f"Column {col!r} has no substring index")
+            row_lists.append(lookup_substring_rows(self.index, col, str(substring)))
+        if query.get('lock') is not None:
+            if query['lock'] not in self.locks:
+                raise QueryError(f"Unknown lock {query['lock']!r}", 404)
+            row_lists.append(self.locks[query['lock']]['rows'])
+        person_uids = self.get_list(query, 'person_uids')
+        if person_uids is not None:
+            row_lists.append(self.person_rows(person_uids))
+        
+        rows = intersect_rows(*row_lists) if row_lists else self.all_rows
+        excluded = self.get_list(query, 'exclude_person_uids')
+        if excluded:
+            rows = np.setdiff1d(rows, self.person_rows(excluded), assume_unique=True)
+        return rows
+    
+    def get_columns(self, columns):
+        """Requested columns (all when None), checked against the dataset"""
+        if columns is None:
+            return list(self.df.columns)
+        missing = [col for col in columns if col not in self.df.columns]
+        if missing:
+            raise QueryError(f"Unknown columns: {missing}")
+        return list(columns)
+    
+    def records_json(self, rows, columns):
+        """JSON array of the given rows as records (missing values as null)"""
+        return self.df.iloc[rows][columns].to_json(orient='records', force_ascii=False)
+    
+    def info(self):
+        return {
+            'source': os.path.basename(self.path),
+            'row_count': len(self.df),
+            'person_count': int(self.df['PersonUID'].nunique()) if 'PersonUID' in self.df.columns else 0,
+            'columns': [str(col) for col in self.df.columns],
+            'indexed_columns': list(self.index['columns']),
+            'substring_columns': list(self.index['ngrams']),
+            'locks': len(self.locks),
+        }
+    
+    def filter(self, query):
+        """Matching rows, paged by offset/limit; total is the full match count"""
+        rows = self.select_rows(query)
+        columns = self.get_columns(query.get('columns'))
+        offset = int(query.get('offset', 0))
+        limit = int(query.get('limit', DEFAULT_LIMIT))
+        page = rows[offset:offset + limit]
+        return f'{{"total":{len(rows)},"offset":{offset},"rows":{self.records_json(page, columns)}}}'
+    
+    def aggregate(self, query):
+        """
+        Record counts (or distinct counts of the "distinct" column) per group_by combination
+        
+        Missing values of indexed (text) columns are reported as '', the value that
+        matches them in "filters"; missing values of other columns are reported as null.
+        """
+        rows = self.select_rows(query)
+        group_by = self.get_columns(query.get('group_by') or [])
+        distinct = query.get('distinct')
+        if distinct is not None:
+            self.get_columns([distinct])
+        selected = self.df.iloc[rows]
+        if not group_by:
+            count = int(selected[distinct].nunique()) if distinct else len(selected)
+            return {'total': len(rows), 'groups': [{'count': count}]}
+        grouped = selected.groupby(group_by, dropna=False, sort=True, observed=True)
+        counts = grouped[distinct].nunique() if distinct else grouped.size()
+        counts = counts.rename('count').reset_index().sort_values('count', ascending=False, kind='stable')
+        for col in group_by:
+            if col in self.index['columns']:
+                counts[col] = counts[col].astype(object).where(counts[col].notna(), '')
+        groups = json.loads(counts.to_json(orient='records', force_ascii=False))
+        return {'total': len(rows), 'groups': groups}
+    
+    def lock(self, query):
+        """Store a lock list and return its id with the rows and persons it covers"""
+        person_uids = self.get_list(query, 'person_uids')
+        if not person_uids:
+            raise QueryError("A lock needs a non-empty person_uids list")
+        rows = self.person_rows(person_uids)
+        lock_id = str(next(self._lock_ids))
+        self.locks[lock_id] = {'rows': rows, 'source': query.get('source', '')}
+        persons = int(self.df['PersonUID'].iloc[rows].nunique())
+        return {'lock': lock_id, 'requested': len(set(map(str, person_uids))), 'persons': persons, 'rows': len(rows)}
+    
+    def unlock(self, lock_id):
+        if self.locks.pop(lock_id, None) is None:
+            raise QueryError(f"Unknown lock {lock_id!r}", 404)
+        return {'lock': lock_id, 'unlocked': True}
+    
+    def officials(self, person_uid):
+        """One official's records in record_number order, as getOfficialsByPersonUID"""
+        rows = self.person_rows([person_uid])
+        if not len(rows):
+            raise QueryError(f"Unknown PersonUID {person_uid!r}", 404)
+        if 'record_number' in self.df.columns:
+            order = self.df['record_number'].iloc[rows].to_numpy().argsort(kind='stable')
+            rows = rows[order]
+        return self.records_json(rows, list(self.df.columns))
+
+def route(dataset, method, path, body):
+    """Dispatch one request; returns (status, JSON text)"""
+    query = json.loads(body) if body else {}
+    if not isinstance(query, dict):
+        raise QueryError("The request body must be a JSON object")
+    parts = [unquote(part) for part in path.split('?')[0].strip('/').split('/')]
+    
+    if parts == ['info'] and method == 'GET':
+        result = dataset.info()
+    elif parts == ['filter'] and method == 'POST':
+        result = dataset.filter(query)
+    elif parts == ['aggregate'] and method == 'POST':
+        result = dataset.aggregate(query)
+    elif parts == ['locks'] and method == 'POST':
+        result = dataset.lock(query)
+    elif len(parts) == 2 and parts[0] == 'locks' and method == 'DELETE':
+        result = dataset.unlock(parts[1])
+    elif len(parts) == 2 and parts[0] == 'officials' and method == 'GET':
+        result = dataset.officials(parts[1])
+    elif parts[0] in ('info', 'filter', 'aggregate', 'locks', 'officials'):
+        raise QueryError(f"{method} is not supported for /{parts[0]}", 405)
+    else:
+        raise QueryError(f"Unknown endpoint {path}", 404)
+    return 200, result if isinstance(result, str) else json.dumps(result, ensure_ascii=False)
+
+async def write_response(writer, status, text=''):
+    """Write a JSON HTTP response; CORS is open so the Vite dev server can call it"""
+    body = text.encode('utf-8')
+    headers = [
+        f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}",
+        "Content-Type: application/json; charset=utf-8",
+        f"Content-Length: {len(body)}",
+        "Access-Control-Allow-Origin: *",
+        "Access-Control-Allow-Methods: GET, POST, DELETE, OPTIONS",
+        "Access-Control-Allow-Headers: Content-Type",
+        "Connection: keep-alive",
+    ]
+    writer.write(("\r\n".join(headers) + "\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+
+async def handle_connection(dataset, reader, writer):
+    """Serve HTTP/1.1 requests on one connection until the client closes it"""
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0))
+            if length > MAX_BODY_BYTES:
+                await write_response(writer, 413, json.dumps({'error': 'Request body too large'}))
+                break
+            body = (await reader.readexactly(length)).decode('utf-8') if length else ''
+            
+            if method == 'OPTIONS':
+                await write_response(writer, 204)
+                continue
+            try:
+                # Queries are CPU-bound; a worker thread keeps the event loop serving other requests
+                status, text = await loop.run_in_executor(None, route, dataset, method, path, body)
+            except QueryError as e:
+                status, text = e.status, json.dumps({'error': str(e)}, ensure_ascii=False)
+            except (ValueError, TypeError, KeyError) as e:
+                status, text = 400, json.dumps({'error': f"Bad request: {e}"}, ensure_ascii=False)
+            except Exception as e:
+                status, text = 500, json.dumps({'error': f"{type(e).__name__}: {e}"}, ensure_ascii=False)
+            await write_response(writer, status, text)
+            if headers.get('connection', '').lower() == 'close':
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(dataset, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Run the query server until cancelled"""
+    server = await asyncio.start_server(lambda r, w: handle_connection(dataset, r, w), host, port)
+    print(f"Serving {os.path.basename(dataset.path)} ({len(dataset.df)} rows) on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Serve filter, lock-list, career and aggregate queries over a converted dataset.")
+    parser.add_argument('input', help="converted .parquet, .feather or .csv file")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.input):
+        print(f"Error: {args.input} does not exist")
+        return 1
+    dataset = QueryDataset(args.input)
+    try:
+        asyncio.run(serve(dataset, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nStopped")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Sparse origin-destination matrices of 地區 transfers for the Regional Flow chart
+
+Each official's records are ordered by record_number (as RegionalFlowChart.vue and
+transition_graphs.py order them) and every pair of consecutive records is a transfer
+from the first record's 地區 to the second's.
+Transfers are counted per (year bucket, background, 旗分, from 地區, to 地區) cell, keyed
+by the record the official moves to: its 陽曆年份 aligned to the bucket span, its
+standardized background and its 旗分. Cells are stored sorted, so each (year bucket,
+background, 旗分) slice is one sparse matrix, and each cell carries a postings list of
+the persons who made that transfer so drill-down needs no rescan. Consecutive records in
+the same 地區 are kept as diagonal cells.
+"""
+
+import json
+import os
+import sys
+
+# Dimensions of a flow cell, in sort order
+FLOW_DIMENSIONS = ['year_bucket', 'background', '旗分', 'from', 'to']
+
+FLOW_MISSING_LABELS = {'地區': '(無地區記錄)', '旗分': '(無旗分)'}
+
+# Years per bucket; buckets start at multiples of the span (1760, 1770, ...)
+DEFAULT_BUCKET_YEARS = 10
+
+FLOWS_VERSION = 1
+
+def build_flow_matrices(df, bucket_years=DEFAULT_BUCKET_YEARS):
+    """
+    Build the 地區 origin-destination matrices as a JSON-serialisable dict
+    
+    cells holds one entry per non-empty cell with its transfer count and an offset into
+    "postings", the sorted distinct person indices (into "persons") of that cell. A
+    person who makes the same transfer twice in one bucket is counted twice but posted
+    once. Records without 陽曆年份 fall into year bucket 0.
+    """
+    import numpy as np
+    import pandas as pd
+    from career_tables import encode_column, get_career_offsets, get_career_stages, standardized_background, \
+        text_column
+    from transition_graphs import sort_by_record_number
+    
+    sorted_df = sort_by_record_number(df)
+    offsets = get_career_offsets(sorted_df)
+    person_index, stage, _ = get_career_stages(offsets)
+    
+    regions = text_column(sorted_df, '地區')
+    regions = np.where(regions != '', regions, FLOW_MISSING_LABELS['地區']).astype(object)
+    banners = text_column(sorted_df, '旗分')
+    banners = np.where(banners != '', banners, FLOW_MISSING_LABELS['旗分']).astype(object)
+    years = (sorted_df['陽曆年份'].fillna(0).astype(np.int64).to_numpy()
+             if '陽曆年份' in sorted_df.columns else np.zeros(len(sorted_df), dtype=np.int64))
+    
+    # Every record after a career's first is the destination of one transfer
+    moves = np.flatnonzero(stage > 1)
+    key_frame = pd.DataFrame({
+        'year_bucket': years[moves] - years[moves] % bucket_years,
+        'background': standardized_background(sorted_df)[moves],
+        '旗分': banners[moves],
+        'from': regions[moves - 1],
+        'to': regions[moves],
+    })
+    movers = person_index[moves]
+    
+    cell_id = key_frame.groupby(FLOW_DIMENSIONS, sort=True).ngroup().to_numpy()
+    cell_counts = np.bincount(cell_id, minlength=cell_id.max() + 1 if len(cell_id) else 0)
+    # Distinct (cell, person) pairs in cell then person order are the postings
+    order = np.lexsort((movers, cell_id))
+    keep = np.r_[True, (np.diff(cell_id[order]) != 0) | (np.diff(movers[order]) != 0)] if len(order) else order
+    posted = order[keep]
+    cell_offsets = np.searchsorted(cell_id[posted], np.arange(len(cell_counts) + 1))
+    cell_keys = key_frame.iloc[posted[cell_offsets[:-1]]] if len(posted) else key_frame
+    
+    dictionaries = {}
+    cells = {'year_bucket': cell_keys['year_bucket'].astype(np.int64).tolist()}
+    for col in ['background', '旗分']:
+        cells[col], dictionaries[col] = encode_column(cell_keys[col])
+    # from and to share one region dictionary so a matrix is indexed by region code on both axes
+    region_codes, dictionaries['地區'] = encode_column(pd.concat([cell_keys['from'], cell_keys['to']]))
+    cells['from'], cells['to'] = region_codes[:len(cell_keys)], region_codes[len(cell_keys):]
+    cells['count'] = cell_counts.tolist()
+    cells['offsets'] = cell_offsets.tolist()
+    
+    return {
+        'version': FLOWS_VERSION,
+        'dimensions': FLOW_DIMENSIONS,
+        'bucket_years': bucket_years,
+        'person_count': len(offsets) - 1,
+        'transfer_count': len(moves),
+        'cell_count': len(cell_counts),
+        'persons': sorted_df['PersonUID'].iloc[offsets[:-1]].astype(str).tolist(),
+        'dictionaries': dictionaries,
+        'cells': cells,
+        'postings': movers[posted].tolist(),
+    }
+
+def write_flow_matrices(df, output_path, bucket_years=DEFAULT_BUCKET_YEARS):
+    """Write the 地區 origin-destination matrices for a converted DataFrame as compact JSON"""
+    flows = build_flow_matrices(df, bucket_years)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(flows, f, ensure_ascii=False, separators=(',', ':'))
+    return flows
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    bucket_years = DEFAULT_BUCKET_YEARS
+    if '--years' in args:
+        i = args.index('--years')
+        bucket_years = int(args[i + 1])
+        del args[i:i + 2]
+    if not args:
+        print("Usage: python regional_flows.py output/<converted file>.csv|.parquet|.feather ... [--years N]")
+        print(f"--years N sets the years per bucket (default: {DEFAULT_BUCKET_YEARS})")
+        sys.exit(1)
+    from career_tables import load_converted_output
+    for converted_path in args:
+        output_path = os.path.splitext(converted_path)[0] + '.flows.json'
+        flows = write_flow_matrices(load_converted_output(converted_path), output_path, bucket_years)
+        print(f"Wrote {flows['transfer_count']} transfers in {flows['cell_count']} cells: {output_path}")
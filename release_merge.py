@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Merge converted releases into one dataset with a harmonised schema
+
+Each converted CSV (e.g. the 1760-1798 and 1850-1864 releases) is read in chunks as
+text, its column names are mapped to their traditional form (so 阳历年份 and 陽曆年份 are
+the same column), and every row gets a release tag. Chunks are sorted by (陽曆年份,
+季節號, record_number) and spilled to temporary run files, which are then combined with
+a streamed k-way merge, so no release is ever held in memory as a whole. Records that
+repeat within one edition (identical in every column except record_number and the
+release tag) are written once, keeping the first release given.
+"""
+
+import csv
+import heapq
+import math
+import os
+import re
+import sys
+import tempfile
+
+RELEASE_COLUMN = 'release'
+
+# Merge order; records are unique within an edition (陽曆年份, 季節號)
+MERGE_SORT_COLUMNS = ['陽曆年份', '季節號', 'record_number']
+
+# Columns ignored when deciding whether two records are the same
+DEDUP_IGNORE_COLUMNS = ['record_number', RELEASE_COLUMN]
+
+DEFAULT_CHUNKSIZE = 100000
+
+def harmonize_column_name(name):
+    """Traditional-Chinese column name, so simplified and traditional variants align"""
+    from stata_to_csv_converter import convert_texts_to_traditional
+    
+    return convert_texts_to_traditional([str(name).strip()])[0]
+
+def get_release_tag(path):
+    """Release tag from a file name: its year range ('1760-1798') or else its name"""
+    name = os.path.basename(path).split('.')[0]
+    match = re.search(r'(\d{4})\s*-\s*(\d{4})', name)
+    return f"{match.group(1)}-{match.group(2)}" if match else name
+
+def read_harmonized_header(path):
+    """Harmonised column names of a converted CSV, in file order"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        header = next(csv.reader(f))
+    return [harmonize_column_name(col) for col in header]
+
+def build_merged_schema(paths):
+    """Union of the harmonised columns (PersonUID first, then first appearance), plus release"""
+    schema = []
+    for path in paths:
+        for col in read_harmonized_header(path):
+            if col not in schema and col != RELEASE_COLUMN:
+                schema.append(col)
+    if 'PersonUID' in schema:
+        schema.remove('PersonUID')
+        schema.insert(0, 'PersonUID')
+    return schema + [RELEASE_COLUMN]
+
+def get_sort_keys(chunk):
+    """Numeric merge keys for a chunk of text values; missing or non-numeric sorts last"""
+    import pandas as pd
+    
+    keys = []
+    for col in MERGE_SORT_COLUMNS:
+        if col in chunk.columns:
+            keys.append(pd.to_numeric(chunk[col], errors='coerce').fillna(math.inf).to_numpy())
+        else:
+            keys.append([math.inf] * len(chunk))
+    return keys
+
+def write_sorted_runs(path, release_index, schema, temp_dir, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Read one converted CSV in chunks and write each chunk, sorted, to a run file
+    
+    Values are kept as the exact text of the source file. Each run row starts with its
+    sort key (陽曆年份, 季節號, release index, record_number) followed by the values in
+    schema order. Returns the run file paths.
+    """
+    import pandas as pd
+    
+    tag = get_release_tag(path)
+    run_paths = []
+    reader = pd.read_csv(path, encoding='utf-8-sig', dtype=str, keep_default_na=False, chunksize=chunksize)
+    for chunk_index, chunk in enumerate(reader):
+        chunk.columns = [harmonize_column_name(col) for col in chunk.columns]
+        chunk = chunk.loc[:, ~chunk.columns.duplicated()].reindex(columns=schema, fill_value='')
+        chunk[RELEASE_COLUMN] = tag
+        year, season, record_number = get_sort_keys(chunk)
+        keyed = pd.DataFrame({'year': year, 'season': season, 'release': release_index,
+                              'record_number': record_number})
+        order = keyed.sort_values(['year', 'season', 'release', 'record_number'], kind='stable').index
+        
+        run_path = os.path.join(temp_dir, f"run_{release_index}_{chunk_index}.csv")
+        with open(run_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerows(
+                [*key, *values] for key, values in zip(keyed.loc[order].itertuples(index=False, name=None),
+                                                       chunk.loc[order].itertuples(index=False, name=None))
+            )
+        run_paths.append(run_path)
+    return run_paths
+
+def iter_run(run_path):
+    """Yield (sort key, values) from a run file"""
+    with open(run_path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.reader(f):
+            yield (float(row[0]), float(row[1]), int(row[2]), float(row[3])), row[4:]
+
+def merge_releases(paths, output_path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Merge converted release CSVs into one CSV (with BOM) with a release column
+    
+    Returns stats: rows read and written, duplicates dropped, rows per release.
+    """
+    schema = build_merged_schema(paths)
+    dedup_positions = [i for i, col in enumerate(schema) if col not in DEDUP_IGNORE_COLUMNS]
+    release_position = schema.index(RELEASE_COLUMN)
+    stats = {'rows_read': 0, 'rows_written': 0, 'duplicates': 0, 'releases': {}}
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        runs = []
+        for release_index, path in enumerate(paths):
+            print(f"Sorting {os.path.basename(path)} (release {get_release_tag(path)})...")
+            runs.extend(write_sorted_runs(path, release_index, schema, temp_dir, chunksize))
+        
+        print(f"Merging {len(runs)} sorted runs...")
+        with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(schema)
+            edition = None
+            seen = set()
+            for key, values in heapq.merge(*[iter_run(run) for run in runs], key=lambda item: item[0]):
+                stats['rows_read'] += 1
+                # Duplicates can only occur within one edition, so only its rows are remembered
+                if key[:2] != edition:
+                    edition = key[:2]
+                    seen.clear()
+                identity = tuple(values[i] for i in dedup_positions)
+                if identity in seen:
+                    stats['duplicates'] += 1
+                    continue
+                seen.add(identity)
+                writer.writerow(values)
+                stats['rows_written'] += 1
+                release = values[release_position]
+                stats['releases'][release] = stats['releases'].get(release, 0) + 1
+    return stats
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    output_path = os.path.join("output", "merged.csv")
+    if '-o' in args:
+        i = args.index('-o')
+        output_path = args[i + 1]
+        del args[i:i + 2]
+    if len(args) < 2:
+        print("Usage: python release_merge.py output/<release A>.csv output/<release B>.csv ... [-o output/merged.csv]")
+        sys.exit(1)
+    stats = merge_releases(args, output_path)
+    print(f"Wrote {stats['rows_written']} rows ({stats['duplicates']} duplicates dropped): {output_path}")
+    for release, rows in stats['releases'].items():
+        print(f"  {release}: {rows} rows")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Embedded SQLite store of the converted records for ad-hoc queries
+
+Loads a converted DataFrame into a single-table SQLite database (<name>.sqlite) with
+batched inserts, then indexes the columns the exploratory scripts keep scanning:
+PersonUID, (陽曆年份, 季節號), (姓, 名), 機構一 and 官職一. Checks such as those in
+check_database_spec.py and check_personid_data.py (duplicate names, record_number
+uniqueness, 序號 resets per edition, one person's records) then run as indexed SQL
+queries instead of full pandas rescans. Uses only the standard library sqlite3 module.
+"""
+
+import contextlib
+import os
+import sqlite3
+import sys
+import time
+
+TABLE_NAME = 'records'
+
+DEFAULT_BATCH_SIZE = 50000
+
+# Index name -> columns; each column is given as its converted (traditional) name
+STORE_INDEXES = {
+    'idx_person': ['PersonUID'],
+    'idx_edition': ['陽曆年份', '季節號'],
+    'idx_name': ['姓', '名'],
+    'idx_institution': ['機構一'],
+    'idx_position': ['官職一'],
+}
+
+# Ad-hoc checks; {year}, {season}, {serial} are replaced by the quoted column names
+STORE_CHECKS = {
+    'record_number_unique': (
+        'SELECT COUNT(*) AS records, COUNT(DISTINCT "record_number") AS distinct_record_numbers '
+        'FROM records'
+    ),
+    'serial_resets_per_edition': (
+        'SELECT COUNT(*) AS editions, SUM(first_serial = 1) AS editions_starting_at_1, '
+        'SUM(max_serial = records) AS editions_numbered_1_to_n FROM ('
+        'SELECT MIN({serial}) AS first_serial, MAX({serial}) AS max_serial, COUNT(*) AS records '
+        'FROM records GROUP BY {year}, {season})'
+    ),
+    'duplicate_names': (
+        'SELECT "姓", "名", COUNT(*) AS records FROM records GROUP BY "姓", "名" '
+        'HAVING COUNT(*) > 1 ORDER BY records DESC LIMIT 10'
+    ),
+    'name_uniqueness': (
+        'SELECT COUNT(*) AS records, (SELECT COUNT(*) FROM (SELECT 1 FROM records GROUP BY "姓", "名")) '
+        'AS distinct_names FROM records'
+    ),
+}
+
+# Simplified spellings of the indexed columns, for stores built from unconverted data
+COLUMN_ALIASES = {'陽曆年份': '阳历年份', '季節號': '季节号', '機構一': '机构一', '官職一': '官职一', '序號': '序号'}
+
+def quote_identifier(name):
+    """SQL identifier quoting for column names"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+def resolve_column(columns, name):
+    """Column of the table matching a converted column name (or its simplified form), or None"""
+    if name in columns:
+        return name
+    alias = COLUMN_ALIASES.get(name)
+    return alias if alias in columns else None
+
+def get_sql_type(dtype):
+    """SQLite column type for a pandas dtype"""
+    import pandas as pd
+    
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+def iter_batches(df, batch_size):
+    """Rows of df as tuples of Python values (missing values as None), batch_size rows at a time"""
+    import pandas as pd
+    
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start:start + batch_size].astype(object)
+        yield list(batch.where(pd.notna(batch), None).itertuples(index=False, name=None))
+
+def write_sqlite_store(df, db_path, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Write df to a new SQLite database at db_path and build the store indexes
+    
+    The database is written to a temporary file with journaling off and moved into
+    place once complete, and indexes are created after the inserts (faster than
+    maintaining them row by row). Returns the number of rows and the indexes built.
+    """
+    temp_path = db_path + '.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    columns = [str(col) for col in df.columns]
+    column_sql = ', '.join(f"{quote_identifier(col)} {get_sql_type(df[col].dtype)}" for col in df.columns)
+    insert_sql = f"INSERT INTO {TABLE_NAME} VALUES ({', '.join('?' * len(columns))})"
+    
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.execute(f"CREATE TABLE {TABLE_NAME} ({column_sql})")
+        for batch in iter_batches(df, batch_size):
+            with connection:
+                connection.executemany(insert_sql, batch)
+        
+        indexes = []
+        for index_name, index_columns in STORE_INDEXES.items():
+            resolved = [resolve_column(columns, col) for col in index_columns]
+            if None in resolved:
+                continue
+            connection.execute(f"CREATE INDEX {index_name} ON {TABLE_NAME} "
+                               f"({', '.join(quote_identifier(col) for col in resolved)})")
+            indexes.append(index_name)
+        connection.execute('ANALYZE')
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temp_path, db_path)
+    return {'rows': len(df), 'indexes': indexes}
+
+def get_table_columns(connection):
+    """Column names of the records table"""
+    return [row[1] for row in connection.execute(f"PRAGMA table_info({TABLE_NAME})")]
+
+def run_store_checks(db_path):
+    """Run STORE_CHECKS against a store; returns {check: (column names, rows, milliseconds)}"""
+    connection = sqlite3.connect(db_path)
+    try:
+        columns = get_table_columns(connection)
+        names = {'year': '陽曆年份', 'season': '季節號', 'serial': '序號'}
+        resolved = {key: resolve_column(columns, col) for key, col in names.items()}
+        results = {}
+        for check, sql in STORE_CHECKS.items():
+            if any(f"{{{key}}}" in sql and resolved[key] is None for key in names):
+                continue
+            sql = sql.format(**{key: quote_identifier(col) for key, col in resolved.items() if col})
+            start = time.perf_counter()
+            cursor = connection.execute(sql)
+            rows = cursor.fetchall()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            results[check] = ([column[0] for column in cursor.description], rows, elapsed_ms)
+        return results
+    finally:
+        connection.close()
+
+def query_person_records(db_path, person_uid=None, surname=None, given_name=None):
+    """One person's records by PersonUID, or by 姓 + 名, in record_number order"""
+    import pandas as pd
+    
+    if person_uid is not None:
+        where, params = '"PersonUID" = ?', [person_uid]
+    else:
+        where, params = '"姓" = ? AND "名" = ?', [surname, given_name]
+    with contextlib.closing(sqlite3.connect(db_path)) as connection:
+        return pd.read_sql_query(f"SELECT * FROM {TABLE_NAME} WHERE {where} ORDER BY \"record_number\"",
+                                 connection, params=params)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    check_only = '--check' in args
+    if check_only:
+        args.remove('--check')
+    if not args:
+        print("Usage: python sqlite_store.py output/<converted file>.csv|.parquet|.feather ... [--check]")
+        print("--check runs the ad-hoc checks on existing .sqlite stores without rebuilding them")
+        sys.exit(1)
+    for path in args:
+        db_path = os.path.splitext(path)[0] + '.sqlite'
+        if not check_only:
+            from career_tables import load_converted_output
+            start = time.perf_counter()
+            store = write_sqlite_store(load_converted_output(path), db_path)
+            print(f"Wrote {store['rows']} rows with {len(store['indexes'])} indexes in "
+                  f"{time.perf_counter() - start:.1f}s: {db_path}")
+        for check, (columns, rows, elapsed_ms) in run_store_checks(db_path).items():
+            print(f"\n{check} ({elapsed_ms:.1f} ms)")
+            print("  " + " | ".join(columns))
+            for row in rows:
+                print("  " + " | ".join(str(value) for value in row))
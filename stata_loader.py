@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Shared loading layer for the exploration scripts: file selection and a cached .dta reader
+"""
+
+import os
+import glob
+import hashlib
+import pickle
+import re
+import subprocess
+import sys
+
+# Cached copies of .dta files, stored as Arrow IPC (Feather)
+CACHE_DIR = ".cache"
+
+# Hex digits of get_cache_key()
+CACHE_KEY_LENGTH = 16
+
+def install_questionary():
+    """Install questionary if not available"""
+    try:
+        import questionary
+    except ImportError:
+        print("Installing questionary...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "questionary"])
+        import questionary
+    return questionary
+
+def select_stata_file(prompt="Select a .dta file:", dta_dir="dta"):
+    """Let user select a .dta file from dta/ directory"""
+    if not os.path.exists(dta_dir):
+        print(f"Directory {dta_dir}/ not found.")
+        return None
+    
+    dta_files = glob.glob(os.path.join(dta_dir, "*.dta"))
+    
+    if not dta_files:
+        print(f"No .dta files found in {dta_dir}/ directory.")
+        return None
+    
+    questionary = install_questionary()
+    
+    file_choices = [os.path.basename(f) for f in dta_files]
+    selected = questionary.select(prompt, choices=file_choices).ask()
+    
+    if not selected:
+        return None
+    
+    return os.path.join(dta_dir, selected)
+
+def get_cache_key(stata_file):
+    """Cache key from absolute path, mtime and size of the .dta file"""
+    stat = os.stat(stata_file)
+    fingerprint = f"{os.path.abspath(stata_file)}|{stat.st_mtime_ns}|{stat.st_size}"
+    return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:CACHE_KEY_LENGTH]
+
+def get_cache_paths(stata_file, cache_dir=CACHE_DIR):
+    """Data and metadata cache paths for the current version of a .dta file"""
+    stem = os.path.splitext(os.path.basename(stata_file))[0]
+    prefix = os.path.join(cache_dir, f"{stem}-{get_cache_key(stata_file)}")
+    return f"{prefix}.feather", f"{prefix}.meta.pkl"
+
+def remove_stale_cache(stata_file, cache_dir=CACHE_DIR):
+    """
+    Remove cache files left over from older versions of a .dta file
+    
+    Only <stem>-<cache key>.feather and <stem>-<cache key>.meta.pkl are removed, so the
+    cache of another file whose name starts with "<stem>-" (cgedq-1900.dta for
+    cgedq.dta) is left alone.
+    """
+    stem = os.path.splitext(os.path.basename(stata_file))[0]
+    current = set(get_cache_paths(stata_file, cache_dir))
+    pattern = re.compile(re.escape(stem) + rf"-[0-9a-f]{{{CACHE_KEY_LENGTH}}}\.(feather|meta\.pkl)")
+    for path in glob.glob(os.path.join(glob.escape(cache_dir), f"{glob.escape(stem)}-*")):
+        if path not in current and pattern.fullmatch(os.path.basename(path)):
+            os.remove(path)
+
+def read_stata_metadata(stata_file, cache_dir=CACHE_DIR):
+    """Read only the metadata of a .dta file (cached next to the data cache)"""
+    import pyreadstat
+    
+    _, meta_path = get_cache_paths(stata_file, cache_dir)
+    if os.path.exists(meta_path):
+        with open(meta_path, 'rb') as f:
+            return pickle.load(f)
+    
+    _, meta = pyreadstat.read_dta(stata_file, metadataonly=True)
+    os.makedirs(cache_dir, exist_ok=True)
+    remove_stale_cache(stata_file, cache_dir)
+    with open(meta_path, 'wb') as f:
+        pickle.dump(meta, f)
+    return meta
+
+def load_stata_file(stata_file, usecols=None, metadataonly=False, cache_dir=CACHE_DIR):
+    """
+    Load a .dta file as (df, meta), using an on-disk columnar cache
+    
+    The first load decodes the whole .dta file and stores it as Feather in cache_dir,
+    keyed by path, mtime and size. Later loads read only the usecols columns from the
+    cache. Columns in usecols that the file does not have are ignored. With
+    metadataonly=True an empty DataFrame is returned along with the metadata.
+    Without pyarrow the .dta file is read directly on every call.
+    """
+    import pandas as pd
+    import pyreadstat
+    
+    meta = read_stata_metadata(stata_file, cache_dir)
+    if usecols is not None:
+        usecols = [col for col in usecols if col in meta.column_names]
+    
+    if metadataonly:
+        return pd.DataFrame(columns=usecols if usecols is not None else meta.column_names), meta
+    
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        print("pyarrow not available, reading .dta file without cache")
+        df, _ = pyreadstat.read_dta(stata_file, usecols=usecols)
+        return df, meta
+    
+    data_path, _ = get_cache_paths(stata_file, cache_dir)
+    if not os.path.exists(data_path):
+        print(f"Building cache for {os.path.basename(stata_file)} (first run only)...")
+        df, _ = pyreadstat.read_dta(stata_file)
+        os.makedirs(cache_dir, exist_ok=True)
+        remove_stale_cache(stata_file, cache_dir)
+        # Write to a temporary name first so an interrupted run never leaves a broken cache
+        temp_path = f"{data_path}.tmp"
+        feather.write_feather(df, temp_path)
+        os.replace(temp_path, data_path)
+        if usecols is not None:
+            df = df[usecols]
+        return df, meta
+    
+    return feather.read_feather(data_path, columns=usecols), meta
@@ -4,6 +4,23 @@ import sys
 import os
 import glob
 import hashlib
+import itertools
+
+# Rows per chunk in streaming mode
+DEFAULT_CHUNKSIZE = 100000
+
+# Recorded in the conversion manifest; bump when the output content would change
+# (each output's version also hashes the source of its writer, see get_output_version)
+CONVERTER_VERSION = "2.1"
+OPENCC_CONFIG = 's2t'  # simplified to traditional
+PERSON_UID_SCHEME = "md5[:12] of 姓名|身份二|旗分|出身一"
+MANIFEST_FILENAME = "conversion_manifest.json"
+
+# Low-cardinality text columns held as categoricals in memory (names after conversion)
+CATEGORY_COLUMNS = ['旗分', '出身一', '身份二', '地區', '機構一', '官職一']
+
+# Whole numbers up to this magnitude are exact in float32
+FLOAT32_EXACT_LIMIT = 1 << 24
 
 def install_package(package):
     """Install a package using pip"""
@@ -14,9 +31,10 @@ def install_package(package):
         print(f"Failed to install {package}")
         sys.exit(1)
 
-def check_and_install_dependencies():
+def check_and_install_dependencies(required_packages=None):
     """Check if required packages are installed, install if not"""
-    required_packages = ['pandas', 'pyreadstat', 'openpyxl', 'questionary', 'opencc']
+    if required_packages is None:
+        required_packages = ['pandas', 'pyreadstat', 'openpyxl', 'questionary', 'opencc']
     
     for package in required_packages:
         try:
@@ -62,80 +80,685 @@ def generate_person_uid(row):
     
     return person_hash
 
+# Columns that make up the PersonUID key: 姓名|身份二|旗分|出身一
+PERSON_UID_FIELDS = ['姓', '名', '身份二', '旗分', '出身一']
+
+def generate_person_uids(df, as_category=False):
+    """Vectorized generate_person_uid over a whole DataFrame
+    
+    Each key field is factorized once, so str()/strip() only runs on distinct values.
+    The rows are then reduced to distinct combinations of field codes, only those
+    keys are hashed, and the hashes are mapped back through the inverse codes.
+    The IDs are bit-identical to generate_person_uid, including 'nan' for missing values.
+    With as_category=True the IDs are returned as a categorical (one 12-character
+    string per person, integer codes per row) with sorted categories, so sorting by
+    PersonUID gives the same order as the plain strings.
+    """
+    import numpy as np
+    import pandas as pd
+    
+    field_codes = []
+    field_labels = []
+    for col in PERSON_UID_FIELDS:
+        if col in df.columns:
+            codes, uniques = pd.factorize(df[col])
+            # Missing values (code -1) become str(NaN) == 'nan', as in the row-wise version
+            labels = [str(value).strip() for value in uniques] + ['nan']
+            codes = np.where(codes < 0, len(uniques), codes)
+        else:
+            codes = np.zeros(len(df), dtype=np.intp)
+            labels = ['']
+        field_codes.append(codes)
+        field_labels.append(labels)
+    
+    if len(df) == 0:
+        return pd.Series([], index=df.index, dtype='category' if as_category else object, name='PersonUID')
+    
+    unique_keys, inverse = np.unique(np.stack(field_codes, axis=1), axis=0, return_inverse=True)
+    surnames, given_names, shenfen_er, qifen, chushen_yi = field_labels
+    hashes = np.array([
+        hashlib.md5(
+            f"{surnames[a]}{given_names[b]}|{shenfen_er[c]}|{qifen[d]}|{chushen_yi[e]}".encode('utf-8')
+        ).hexdigest()[:12]
+        for a, b, c, d, e in unique_keys
+    ], dtype=object)
+    
+    if as_category:
+        # Distinct keys can share a truncated hash, so the categories are deduplicated
+        categories, hash_codes = np.unique(hashes.astype(str), return_inverse=True)
+        uids = pd.Categorical.from_codes(hash_codes.reshape(-1)[inverse.reshape(-1)], categories)
+        return pd.Series(uids, index=df.index, name='PersonUID')
+    return pd.Series(hashes[inverse.reshape(-1)], index=df.index, name='PersonUID')
+
+def benchmark_person_uid(stata_file_path, repeat=3):
+    """Compare row-wise and vectorized PersonUID generation on a .dta file
+    
+    Usage: python -c "import stata_to_csv_converter as c; c.benchmark_person_uid('dta/<file>.dta')"
+    """
+    import time
+    import pyreadstat
+    
+    df, meta = pyreadstat.read_dta(stata_file_path)
+    df = convert_dataframe_to_traditional(df)
+    
+    results = {}
+    for label, func in [("row-wise apply", lambda: df.apply(generate_person_uid, axis=1)),
+                        ("vectorized", lambda: generate_person_uids(df))]:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            uids = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[label] = (best, uids)
+        print(f"{label}: {best:.3f}s for {len(df)} rows ({len(df) / best:,.0f} rows/s)")
+    
+    identical = results["row-wise apply"][1].equals(results["vectorized"][1])
+    print(f"Identical PersonUIDs: {identical}")
+    print(f"Speedup: {results['row-wise apply'][0] / results['vectorized'][0]:.1f}x")
+    return {label: elapsed for label, (elapsed, _) in results.items()}
+
+def normalize_juren(text):
+    """Normalize 举人/擧人 variants to 舉人"""
+    return text.replace('举人', '舉人').replace('擧人', '舉人')
+
+# Process-wide OpenCC converter, loaded once by get_opencc_converter
+_opencc_converter = None
+_opencc_load_failed = False
+
+def get_opencc_converter():
+    """The OpenCC converter for OPENCC_CONFIG, loaded on first use and then reused
+    
+    Loading the dictionaries is far more expensive than converting a string, so every
+    function in this module shares one converter per process; worker processes load it
+    in their initializer, before any file is converted. Returns None (after one warning)
+    if opencc is missing or fails to load.
+    """
+    global _opencc_converter, _opencc_load_failed
+    
+    if _opencc_converter is None and not _opencc_load_failed:
+        try:
+            import opencc
+            _opencc_converter = opencc.OpenCC(OPENCC_CONFIG)
+        except ImportError:
+            print(f"Warning: opencc module not available, using original text")
+            _opencc_load_failed = True
+        except Exception as e:
+            print(f"Warning: opencc conversion failed ({e}), using original text")
+            _opencc_load_failed = True
+    return _opencc_converter
+
 def convert_text_to_traditional(text):
     """Convert text to traditional Chinese using opencc"""
+    converter = get_opencc_converter()
+    if converter is None:
+        return str(text)
     try:
-        import opencc
-        converter = opencc.OpenCC('s2t')  # simplified to traditional
         return converter.convert(str(text))
-    except ImportError:
-        print(f"Warning: opencc module not available, using original text")
-        return str(text)
     except Exception as e:
         print(f"Warning: opencc conversion failed ({e}), using original text")
         return str(text)
 
 def convert_csv_string_to_traditional(csv_string):
     """Convert CSV string to traditional Chinese using opencc Python module"""
-    import re
+    converter = get_opencc_converter()
+    converted_string = csv_string
+    if converter is not None:
+        try:
+            # Convert the entire CSV string at once
+            converted_string = converter.convert(csv_string)
+        except Exception as e:
+            print(f"Warning: opencc conversion failed ({e}), using original text")
+    
+    # Special replacement for 举人 -> 舉人 and 擧人 -> 舉人
+    return normalize_juren(converted_string)
+
+# Memo cache of simplified -> traditional values, shared across columns, chunks and files
+_traditional_value_cache = {}
+
+def convert_texts_to_traditional(values):
+    """Batch conversion of a list or array of values to traditional Chinese
+    
+    Strings are converted with the shared converter and 举人/擧人 normalized; each
+    distinct string goes through OpenCC once per process thanks to the memo cache,
+    so calling this per cell or per chunk stays cheap. Non-string values (NaN, None,
+    numbers) are returned unchanged, and a string OpenCC fails on keeps its original
+    text. Returns a list in the input order.
+    """
+    converter = get_opencc_converter()
+    converted_values = []
+    for value in values:
+        if not isinstance(value, str):
+            converted_values.append(value)
+            continue
+        converted = _traditional_value_cache.get(value)
+        if converted is None:
+            try:
+                converted = normalize_juren(converter.convert(value) if converter else value)
+            except Exception as e:
+                # Failures are not cached, so the value is retried on its next occurrence
+                print(f"Warning: opencc conversion failed ({e}), using original text")
+                converted = normalize_juren(value)
+            else:
+                if converter:
+                    _traditional_value_cache[value] = converted
+        converted_values.append(converted)
+    return converted_values
+
+def to_category(codes, labels):
+    """Categorical from factorize codes and their (possibly repeated or NaN) labels
+    
+    Labels that convert to the same text share one category, NaN labels and code -1
+    become missing, and categories are sorted.
+    """
+    import numpy as np
+    import pandas as pd
+    
+    valid = np.flatnonzero(pd.notna(labels))
+    categories, category_codes = np.unique(np.asarray(labels[valid], dtype=str), return_inverse=True)
+    # One slot per label plus a trailing -1 that code -1 (missing) picks
+    remap = np.full(len(labels) + 1, -1, dtype=np.int64)
+    remap[valid] = category_codes.reshape(-1)
+    return pd.Categorical.from_codes(remap[codes], categories)
+
+def downcast_numeric(values):
+    """Smallest dtype that holds numeric values exactly, keeping their text form
+    
+    Integer columns are downcast to the smallest integer type. Float columns become
+    float32 only when every value is a whole number within FLOAT32_EXACT_LIMIT (Stata
+    stores codes, years and record numbers as doubles), so CSV output is unchanged.
+    """
+    import numpy as np
+    import pandas as pd
+    
+    if values.dtype.kind in 'iu':
+        return pd.to_numeric(values, downcast='integer')
+    if values.dtype == np.float64:
+        finite = values[~np.isnan(values)]
+        if np.all(np.abs(finite) < FLOAT32_EXACT_LIMIT) and np.array_equal(finite, np.trunc(finite)):
+            return values.astype(np.float32)
+    return values
+
+def convert_dataframe_to_traditional(df, compact=False):
+    """Convert DataFrame text columns and headers to traditional Chinese
+    
+    Only object/string columns are converted, and each distinct value goes through
+    OpenCC once: values are factorized per column, the uniques are looked up in a
+    memo cache and the results are mapped back through the codes. Numeric columns
+    are left untouched. Empty strings become NaN, as in the old CSV round trip.
+    With compact=True the CATEGORY_COLUMNS are built as categoricals straight from
+    the codes and numeric columns are downcast (see downcast_numeric); the values,
+    and therefore every written output, stay the same.
+    """
+    import numpy as np
+    import pandas as pd
+    from pandas.api.types import is_object_dtype, is_string_dtype
     
+    columns = {}
+    headers = convert_texts_to_traditional([str(col) for col in df.columns])
+    for col, header in zip(df.columns, headers):
+        series = df[col]
+        if is_object_dtype(series.dtype) or is_string_dtype(series.dtype):
+            codes, uniques = pd.factorize(series)
+            converted_uniques = np.array(
+                [np.nan if value == '' else value for value in convert_texts_to_traditional(uniques)] + [np.nan],
+                dtype=object
+            )
+            if compact and header in CATEGORY_COLUMNS:
+                values = to_category(codes, converted_uniques[:-1])
+            else:
+                # Code -1 (missing) picks the trailing NaN
+                values = converted_uniques[codes]
+        else:
+            values = series.to_numpy()
+            if compact:
+                values = downcast_numeric(values)
+        columns[header] = values
+    
+    return pd.DataFrame(columns, index=df.index)
+
+def add_person_uid_column(df, compact=False):
+    """Add PersonUID column (computed from traditional Chinese content) as the first column
+    
+    compact=True stores PersonUID as a categorical (see generate_person_uids).
+    """
+    df['PersonUID'] = generate_person_uids(df, as_category=compact)
+    
+    # Move PersonUID to first column
+    cols = ['PersonUID'] + [col for col in df.columns if col != 'PersonUID']
+    return df[cols]
+
+def load_converted_dataframe(stata_file_path, report=None):
+    """Read a .dta file, convert it to traditional Chinese and add PersonUID
+    
+    The result is held compactly (categorical text and PersonUID columns, downcast
+    numbers) for the writers; it writes exactly the same files as the plain frame.
+    Each step is measured as a stage of report (a ConversionReport) when given.
+    """
+    import pyreadstat
+    from conversion_report import ConversionReport
+    
+    report = report or ConversionReport(stata_file_path)
+    with report.stage('read') as stage:
+        df, meta = pyreadstat.read_dta(stata_file_path)
+        stage['rows'] = len(df)
+    
+    # First convert all content to traditional Chinese
+    print("Converting simplified Chinese to traditional Chinese...")
+    with report.stage('opencc', len(df)):
+        df = convert_dataframe_to_traditional(df, compact=True)
+    
+    # Add PersonUID column using traditional Chinese content
+    print("Generating PersonUID...")
+    with report.stage('person_uid', len(df)):
+        return add_person_uid_column(df, compact=True)
+
+def write_csv(df, output_csv_path):
+    """Write converted DataFrame to CSV with BOM"""
+    print("Generating final CSV...")
+    with open(output_csv_path, 'w', encoding='utf-8-sig') as f:
+        df.to_csv(f, index=False)
+    print(f"Successfully converted to CSV with PersonUID: {output_csv_path}")
+
+def write_excel(df, output_excel_path):
+    """Write converted DataFrame to Excel"""
+    df.to_excel(output_excel_path, index=False, engine='openpyxl')
+    print(f"Successfully converted to Excel with PersonUID: {output_excel_path}")
+
+def to_arrow_table(df):
+    """Build an Arrow table with every string column dictionary-encoded
+    
+    Columns downcast in memory are written with the published types: float32 as
+    float64, narrower integers as int64 and categoricals as dictionary<int32, string>.
+    """
+    import numpy as np
+    import pyarrow as pa
+    
+    # Widen before conversion so the pandas metadata stored with the table matches too
+    widened = {col: np.float64 if df[col].dtype == np.float32 else np.int64
+               for col in df.columns
+               if df[col].dtype == np.float32 or (df[col].dtype.kind in 'iu' and df[col].dtype.itemsize < 8)}
+    table = pa.Table.from_pandas(df.astype(widened) if widened else df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, table.column(i).dictionary_encode())
+        elif pa.types.is_dictionary(field.type) and field.type.index_type != pa.int32():
+            dictionary_type = pa.dictionary(pa.int32(), field.type.value_type)
+            table = table.set_column(i, field.name, table.column(i).cast(dictionary_type))
+    return table
+
+def write_parquet(df, output_parquet_path):
+    """Write converted DataFrame to Parquet with dictionary-encoded string columns"""
+    import pyarrow.parquet as pq
+    
+    pq.write_table(to_arrow_table(df), output_parquet_path, compression='zstd')
+    print(f"Successfully converted to Parquet with PersonUID: {output_parquet_path}")
+
+def write_feather(df, output_feather_path):
+    """Write converted DataFrame to Arrow IPC (Feather v2)
+    
+    Written uncompressed so readers can memory-map the file without copying.
+    """
+    import pyarrow.feather as feather
+    
+    feather.write_feather(to_arrow_table(df), output_feather_path, compression='uncompressed')
+    print(f"Successfully converted to Arrow IPC with PersonUID: {output_feather_path}")
+
+def write_careers(df, output_careers_path):
+    """Write the precomputed per-person career table (see career_tables.py)"""
+    from career_tables import write_career_table
+    
+    table = write_career_table(df, output_careers_path)
+    print(f"Successfully wrote career table ({table['person_count']} officials): {output_careers_path}")
+
+def write_cube(df, output_cube_path):
+    """Write the pre-aggregated institution composition cube (see career_tables.py)"""
+    from career_tables import write_composition_cube
+    
+    cube = write_composition_cube(df, output_cube_path)
+    print(f"Successfully wrote composition cube ({cube['cell_count']} cells): {output_cube_path}")
+
+def write_index(df, output_index_path):
+    """Write inverted filter indexes (.index.json + .index.bin, see filter_index.py)"""
+    from filter_index import write_filter_index
+    
+    header = write_filter_index(df, output_index_path)
+    print(f"Successfully wrote filter index ({len(header['columns'])} columns): {output_index_path}")
+
+def write_bundle(df, output_bundle_path):
+    """Write the columnar binary dataset bundle for the frontend (see dataset_bundle.py)"""
+    from dataset_bundle import write_dataset_bundle
+    
+    header = write_dataset_bundle(df, output_bundle_path)
+    print(f"Successfully wrote dataset bundle ({header['byte_length']} bytes): {output_bundle_path}")
+
+def write_linkage(df, output_linkage_path):
+    """Write the PersonUID -> LinkedPersonID linkage table (see person_linkage.py)"""
+    from person_linkage import write_person_linkage
+    
+    linkage = write_person_linkage(df, output_linkage_path)
+    print(f"Successfully wrote linkage of {len(linkage)} PersonUIDs into "
+          f"{linkage['LinkedPersonID'].nunique()} persons: {output_linkage_path}")
+
+def write_shards(df, output_shards_path):
+    """Write per-year CSV shards and their partition manifest (see year_shards.py)"""
+    from year_shards import write_year_shards
+    
+    manifest = write_year_shards(df, output_shards_path)
+    print(f"Successfully wrote {len(manifest['shards'])} year shards ({manifest['written']} changed): "
+          f"{output_shards_path}")
+
+def write_transitions(df, output_transitions_path):
+    """Write the precomputed career transition graphs (see transition_graphs.py)"""
+    from transition_graphs import write_transition_graphs
+    
+    write_transition_graphs(df, output_transitions_path)
+    print(f"Successfully wrote transition graphs: {output_transitions_path}")
+
+def write_flows(df, output_flows_path):
+    """Write the 地區 origin-destination matrices (see regional_flows.py)"""
+    from regional_flows import write_flow_matrices
+    
+    flows = write_flow_matrices(df, output_flows_path)
+    print(f"Successfully wrote {flows['cell_count']} regional flow cells: {output_flows_path}")
+
+def write_sqlite(df, output_sqlite_path):
+    """Load the converted records into an indexed SQLite store (see sqlite_store.py)"""
+    from sqlite_store import write_sqlite_store
+    
+    store = write_sqlite_store(df, output_sqlite_path)
+    print(f"Successfully wrote SQLite store with {len(store['indexes'])} indexes: {output_sqlite_path}")
+
+# Output format -> (file extension, display name, writer)
+OUTPUT_WRITERS = {
+    'csv': ('.csv', 'CSV', write_csv),
+    'excel': ('.xlsx', 'Excel', write_excel),
+    'parquet': ('.parquet', 'Parquet', write_parquet),
+    'feather': ('.feather', 'Arrow IPC (Feather)', write_feather),
+    'careers': ('.careers.json', 'Career table (JSON)', write_careers),
+    'cube': ('.cube.json', 'Institution composition cube (JSON)', write_cube),
+    'index': ('.index.json', 'Filter index (JSON + binary)', write_index),
+    'bundle': ('.bundle.json', 'Frontend binary bundle (JSON + binary)', write_bundle),
+    'linkage': ('.linkage.csv', 'PersonUID linkage table (CSV)', write_linkage),
+    'shards': ('.shards.json', 'Per-year CSV shards + manifest', write_shards),
+    'transitions': ('.transitions.json', 'Career transition graphs (JSON)', write_transitions),
+    'flows': ('.flows.json', 'Regional flow matrices (JSON)', write_flows),
+    'sqlite': ('.sqlite', 'SQLite database (indexed)', write_sqlite),
+}
+
+# Modules that write each derived output format, besides this one
+OUTPUT_MODULES = {
+    'careers': ['career_tables'],
+    'cube': ['career_tables'],
+    'index': ['filter_index', 'career_tables'],
+    'bundle': ['dataset_bundle', 'career_tables'],
+    'linkage': ['person_linkage', 'career_tables'],
+    'shards': ['year_shards', 'career_tables'],
+    'transitions': ['transition_graphs', 'career_tables'],
+    'flows': ['regional_flows', 'transition_graphs', 'career_tables'],
+    'sqlite': ['sqlite_store', 'career_tables'],
+}
+
+_output_versions = {}
+
+# Output formats that need pyarrow, installed only when selected
+ARROW_FORMATS = ['parquet', 'feather']
+
+# Output formats whose PersonUID column can be rebuilt in place
+UID_REBUILD_FORMATS = ['csv', 'parquet', 'feather']
+
+def get_output_path(stata_file_path, output_format, output_dir="output"):
+    """Output file path for a .dta file in the given output format"""
+    extension = OUTPUT_WRITERS[output_format][0]
+    return os.path.join(output_dir, os.path.basename(stata_file_path).replace('.dta', extension))
+
+def compute_file_hash(path, block_size=1 << 20):
+    """SHA-256 of a file, read in blocks"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+def load_manifest(output_dir="output"):
+    """Load the conversion manifest (output filename -> entry) from output_dir"""
+    import json
+    
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return {}
     try:
-        # Try using opencc Python module to convert the entire CSV string
-        import opencc
-        converter = opencc.OpenCC('s2t')  # simplified to traditional
-        converted_string = converter.convert(csv_string)
-    except ImportError:
-        print(f"Warning: opencc module not available, using original text")
-        converted_string = csv_string
-    except Exception as e:
-        print(f"Warning: opencc conversion failed ({e}), using original text")
-        converted_string = csv_string
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('outputs', {})
+    except (OSError, ValueError) as e:
+        print(f"Warning: could not read {manifest_path} ({e}), reconverting everything")
+        return {}
+
+def save_manifest(manifest, output_dir="output"):
+    """Write the conversion manifest atomically"""
+    import json
     
-    # Special replacement for 举人 -> 舉人 and 擧人 -> 舉人
-    converted_string = re.sub(r'举人', '舉人', converted_string)
-    converted_string = re.sub(r'擧人', '舉人', converted_string)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'outputs': manifest}, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+def build_manifest_entry(stata_file_path, output_format, source_hash):
+    """Manifest entry describing how an output file was produced"""
+    from datetime import datetime
+    
+    return {
+        'source': os.path.basename(stata_file_path),
+        'source_sha256': source_hash,
+        'format': output_format,
+        'converter_version': CONVERTER_VERSION,
+        'output_version': get_output_version(output_format),
+        'opencc_config': OPENCC_CONFIG,
+        'person_uid_scheme': PERSON_UID_SCHEME,
+        'converted_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+def get_output_version(output_format):
+    """
+    Version of an output format recorded in its manifest entries
     
-    return converted_string
+    CONVERTER_VERSION plus a hash of the source of this module and of the format's
+    OUTPUT_MODULES, so editing the conversion or a writer invalidates that format's
+    existing outputs without anyone having to remember a version bump.
+    """
+    if output_format not in _output_versions:
+        sha256 = hashlib.sha256()
+        module_dir = os.path.dirname(os.path.abspath(__file__))
+        for path in [os.path.abspath(__file__)] + [os.path.join(module_dir, f"{module}.py")
+                                                   for module in OUTPUT_MODULES.get(output_format, [])]:
+            with open(path, 'rb') as f:
+                sha256.update(f.read())
+        _output_versions[output_format] = f"{CONVERTER_VERSION}+{sha256.hexdigest()[:12]}"
+    return _output_versions[output_format]
+
+def plan_output(output_path, output_format, entry, source_hash):
+    """Decide what an output needs: 'skip' (up to date), 'uid' (PersonUID only) or 'full'"""
+    if not entry or not os.path.exists(output_path):
+        return 'full'
+    if (entry.get('source_sha256') != source_hash
+            or entry.get('converter_version') != CONVERTER_VERSION
+            or entry.get('output_version') != get_output_version(output_format)
+            or entry.get('opencc_config') != OPENCC_CONFIG):
+        return 'full'
+    if entry.get('person_uid_scheme') != PERSON_UID_SCHEME:
+        # Excel has no cheap way to rewrite one column, derived tables must be rebuilt
+        return 'uid' if output_format in UID_REBUILD_FORMATS else 'full'
+    return 'skip'
+
+def rebuild_person_uid(output_path, output_format, chunksize=DEFAULT_CHUNKSIZE):
+    """Recompute only the PersonUID column of an existing converted output"""
+    import pandas as pd
+    
+    print(f"Rebuilding PersonUID column: {output_path}")
+    if output_format == 'csv':
+        # Stream the existing CSV into a new file, replacing PersonUID chunk by chunk
+        temp_path = f"{output_path}.tmp"
+        reader = pd.read_csv(output_path, encoding='utf-8-sig', chunksize=chunksize)
+        for chunk_index, df in enumerate(reader):
+            df = add_person_uid_column(df.drop(columns=['PersonUID'], errors='ignore'))
+            if chunk_index == 0:
+                with open(temp_path, 'w', encoding='utf-8-sig') as f:
+                    df.to_csv(f, index=False)
+            else:
+                with open(temp_path, 'a', encoding='utf-8') as f:
+                    df.to_csv(f, index=False, header=False)
+        os.replace(temp_path, output_path)
+        return
+    
+    if output_format == 'parquet':
+        df = pd.read_parquet(output_path)
+    else:
+        df = pd.read_feather(output_path)
+    df = add_person_uid_column(df.drop(columns=['PersonUID'], errors='ignore'))
+    OUTPUT_WRITERS[output_format][2](df, output_path)
+
+def get_report_path(stata_file_path, output_dir="output"):
+    """Path of the per-stage conversion report written next to the outputs"""
+    return os.path.join(output_dir, os.path.basename(stata_file_path).replace('.dta', '.report.json'))
+
+def convert_stata_file(stata_file_path, output_formats, output_dir="output", streaming=False,
+                       chunksize=DEFAULT_CHUNKSIZE, manifest=None, force=False, profile=None):
+    """Convert a .dta file to every requested output format
+    
+    The file is read, converted and given PersonUIDs once, then handed to each writer.
+    With streaming=True the CSV is written chunk by chunk instead. Outputs whose manifest
+    entry matches the source hash and conversion settings are skipped unless force=True;
+    if only the PersonUID scheme changed, only that column is rebuilt.
+    Wall time, CPU time, rows/sec and peak RSS of every stage that ran are written to
+    <name>.report.json; profile ('cprofile' or 'tracemalloc') adds a profiling section.
+    Returns (dict of output format -> success, dict of updated manifest entries).
+    """
+    from conversion_report import ConversionReport, format_report
+    
+    if not os.path.exists(stata_file_path):
+        print(f"Error: File {stata_file_path} not found")
+        return {output_format: False for output_format in output_formats}, {}
+    
+    report = ConversionReport(stata_file_path, profile)
+    if manifest is None:
+        manifest = load_manifest(output_dir)
+    with report.stage('hash'):
+        source_hash = compute_file_hash(stata_file_path)
+    
+    results = {}
+    manifest_updates = {}
+    full_formats = []
+    for output_format in output_formats:
+        output_path = get_output_path(stata_file_path, output_format, output_dir)
+        output_name = os.path.basename(output_path)
+        action = 'full' if force else plan_output(output_path, output_format, manifest.get(output_name), source_hash)
+        if action == 'skip':
+            print(f"Up to date, skipping: {output_path}")
+            results[output_format] = True
+        elif action == 'uid':
+            try:
+                with report.stage(f'rebuild_uid:{output_format}'):
+                    rebuild_person_uid(output_path, output_format, chunksize)
+                results[output_format] = True
+                manifest_updates[output_name] = build_manifest_entry(stata_file_path, output_format, source_hash)
+            except Exception as e:
+                print(f"Error rebuilding PersonUID in {output_path}: {e}")
+                full_formats.append(output_format)
+        else:
+            full_formats.append(output_format)
+    
+    def record(output_format, success):
+        results[output_format] = success
+        if success:
+            output_name = os.path.basename(get_output_path(stata_file_path, output_format, output_dir))
+            manifest_updates[output_name] = build_manifest_entry(stata_file_path, output_format, source_hash)
+    
+    def finish():
+        # Only report conversions that did work beyond hashing the source
+        if set(report.stages) - {'hash'} or profile:
+            report_path = get_report_path(stata_file_path, output_dir)
+            print(f"Stage timings for {os.path.basename(stata_file_path)}:")
+            print(format_report(report.write(report_path)))
+            print(f"Conversion report: {report_path}")
+        return results, manifest_updates
+    
+    if streaming and 'csv' in full_formats:
+        full_formats.remove('csv')
+        record('csv', convert_stata_to_csv_streaming(stata_file_path, output_dir, chunksize, report))
+    
+    if not full_formats:
+        return finish()
+    
+    try:
+        df = load_converted_dataframe(stata_file_path, report)
+    except Exception as e:
+        print(f"Error reading {stata_file_path}: {e}")
+        results.update({output_format: False for output_format in full_formats})
+        return finish()
+    
+    for output_format in full_formats:
+        _, display_name, writer = OUTPUT_WRITERS[output_format]
+        try:
+            with report.stage(f'write:{output_format}', len(df)):
+                writer(df, get_output_path(stata_file_path, output_format, output_dir))
+            record(output_format, True)
+        except Exception as e:
+            print(f"Error converting to {display_name}: {e}")
+            record(output_format, False)
+    return finish()
 
 def convert_stata_to_csv(stata_file_path, output_dir="output"):
     """Convert Stata .dta file to CSV with BOM and PersonUID"""
-    import pandas as pd
+    return convert_stata_file(stata_file_path, ['csv'], output_dir, force=True)[0]['csv']
+
+def convert_stata_to_csv_streaming(stata_file_path, output_dir="output", chunksize=DEFAULT_CHUNKSIZE, report=None):
+    """Convert Stata .dta file to CSV with BOM and PersonUID, chunk by chunk
+    
+    Peak memory is bounded by chunksize rather than by file size: each chunk is
+    read, converted to traditional Chinese, given PersonUIDs and appended to the
+    output before the next chunk is read. PersonUID only depends on the row itself,
+    so the result matches convert_stata_to_csv. Stage metrics are summed over the
+    chunks into report when given.
+    """
     import pyreadstat
+    from conversion_report import ConversionReport
     
     if not os.path.exists(stata_file_path):
         print(f"Error: File {stata_file_path} not found")
         return False
     
-    filename = os.path.basename(stata_file_path).replace('.dta', '.csv')
-    output_csv_path = os.path.join(output_dir, filename)
+    output_csv_path = get_output_path(stata_file_path, 'csv', output_dir)
+    report = report or ConversionReport(stata_file_path)
     
     try:
-        df, meta = pyreadstat.read_dta(stata_file_path)
-        
-        # First convert all content to traditional Chinese
-        print("Converting simplified Chinese to traditional Chinese...")
-        csv_string = df.to_csv(index=False)
-        converted_csv_string = convert_csv_string_to_traditional(csv_string)
-        
-        # Read back as DataFrame with traditional Chinese content
-        from io import StringIO
-        df = pd.read_csv(StringIO(converted_csv_string))
-        
-        # Add PersonUID column using traditional Chinese content
-        print("Generating PersonUID...")
-        df['PersonUID'] = df.apply(generate_person_uid, axis=1)
+        _, meta = pyreadstat.read_dta(stata_file_path, metadataonly=True)
+        total_rows = 0
+        reader = iter(pyreadstat.read_file_in_chunks(pyreadstat.read_dta, stata_file_path, chunksize=chunksize))
+        for chunk_index in itertools.count():
+            with report.stage('read') as stage:
+                chunk = next(reader, None)
+                stage['rows'] = len(chunk[0]) if chunk is not None else 0
+            if chunk is None:
+                break
+            df = chunk[0]
+            with report.stage('opencc', len(df)):
+                df = convert_dataframe_to_traditional(df)
+            with report.stage('person_uid', len(df)):
+                df = add_person_uid_column(df)
+            
+            # First chunk creates the file with BOM and header, later chunks append rows only
+            with report.stage('write:csv', len(df)):
+                if chunk_index == 0:
+                    with open(output_csv_path, 'w', encoding='utf-8-sig') as f:
+                        df.to_csv(f, index=False)
+                else:
+                    with open(output_csv_path, 'a', encoding='utf-8') as f:
+                        df.to_csv(f, index=False, header=False)
+            
+            total_rows += len(df)
+            print(f"  Processed {total_rows}/{meta.number_rows} rows...")
         
-        # Move PersonUID to first column
-        cols = ['PersonUID'] + [col for col in df.columns if col != 'PersonUID']
-        df = df[cols]
-        
-        # Convert to final CSV string
-        print("Generating final CSV...")
-        final_csv_string = df.to_csv(index=False)
-        
-        # Write to file with BOM
-        with open(output_csv_path, 'w', encoding='utf-8-sig') as f:
-            f.write(final_csv_string)
         print(f"Successfully converted to CSV with PersonUID: {output_csv_path}")
         return True
     except Exception as e:
@@ -144,45 +767,204 @@ def convert_stata_to_csv(stata_file_path, output_dir="output"):
 
 def convert_stata_to_excel(stata_file_path, output_dir="output"):
     """Convert Stata .dta file to Excel with PersonUID"""
-    import pandas as pd
-    import pyreadstat
+    return convert_stata_file(stata_file_path, ['excel'], output_dir, force=True)[0]['excel']
+
+def convert_stata_file_timed(stata_file_path, output_formats, output_dir="output", streaming=False,
+                             chunksize=DEFAULT_CHUNKSIZE, manifest=None, force=False, profile=None):
+    """convert_stata_file plus per-file stats: row count, wall time and rows/sec
     
-    if not os.path.exists(stata_file_path):
-        print(f"Error: File {stata_file_path} not found")
-        return False
+    Returns (results, manifest updates, stats dict). Per-stage figures are in the
+    file's conversion report (see convert_stata_file).
+    """
+    import time
     
-    filename = os.path.basename(stata_file_path).replace('.dta', '.xlsx')
-    output_excel_path = os.path.join(output_dir, filename)
+    start = time.perf_counter()
+    results, manifest_updates = convert_stata_file(
+        stata_file_path, output_formats, output_dir, streaming, chunksize, manifest, force, profile
+    )
+    seconds = time.perf_counter() - start
     
-    try:
-        df, meta = pyreadstat.read_dta(stata_file_path)
-        
-        # First convert all content to traditional Chinese
-        print("Converting simplified Chinese to traditional Chinese...")
-        csv_string = df.to_csv(index=False)
-        converted_csv_string = convert_csv_string_to_traditional(csv_string)
-        
-        # Read back as DataFrame with traditional Chinese content
-        from io import StringIO
-        df = pd.read_csv(StringIO(converted_csv_string))
-        
-        # Add PersonUID column using traditional Chinese content
-        print("Generating PersonUID...")
-        df['PersonUID'] = df.apply(generate_person_uid, axis=1)
-        
-        # Move PersonUID to first column
-        cols = ['PersonUID'] + [col for col in df.columns if col != 'PersonUID']
-        df_converted = df[cols]
-        
-        df_converted.to_excel(output_excel_path, index=False, engine='openpyxl')
-        print(f"Successfully converted to Excel with PersonUID: {output_excel_path}")
-        return True
-    except Exception as e:
-        print(f"Error converting to Excel: {e}")
-        return False
+    rows = None
+    if os.path.exists(stata_file_path):
+        import pyreadstat
+        _, meta = pyreadstat.read_dta(stata_file_path, metadataonly=True)
+        rows = meta.number_rows
+    
+    stats = {
+        'file': os.path.basename(stata_file_path),
+        'outputs': results,
+        'converted': sorted(os.path.basename(name) for name in manifest_updates),
+        'rows': rows,
+        'seconds': round(seconds, 3),
+        # Throughput only means something when at least one output was actually written
+        'rows_per_second': round(rows / seconds, 1) if rows and seconds > 0 and manifest_updates else None,
+    }
+    return results, manifest_updates, stats
 
-def main():
-    print("Stata to CSV/Excel Converter")
+def convert_files(files_to_convert, output_formats, output_dir="output", jobs=1, streaming=False,
+                  chunksize=DEFAULT_CHUNKSIZE, force=False, profile=None):
+    """Convert several .dta files, in parallel worker processes when jobs > 1
+    
+    Returns a dict of file path -> stats (see convert_stata_file_timed), where
+    stats['outputs'] maps each output format to success. Progress is reported and
+    the conversion manifest is saved as each file finishes.
+    """
+    import time
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    
+    total = len(files_to_convert)
+    manifest = load_manifest(output_dir)
+    results = {}
+    start = time.perf_counter()
+    
+    def report(stata_file, file_results, manifest_updates, stats):
+        results[stata_file] = stats
+        if manifest_updates:
+            manifest.update(manifest_updates)
+            save_manifest(manifest, output_dir)
+        status = "done" if any(file_results.values()) else "failed"
+        print(f"[{len(results)}/{total}] {os.path.basename(stata_file)}: {status} "
+              f"({time.perf_counter() - start:.1f}s elapsed)")
+    
+    if jobs <= 1 or total <= 1:
+        for stata_file in files_to_convert:
+            print(f"\nConverting: {os.path.basename(stata_file)}")
+            report(stata_file, *convert_stata_file_timed(
+                stata_file, output_formats, output_dir, streaming, chunksize, manifest, force, profile
+            ))
+        return results
+    
+    # Each worker loads the OpenCC dictionaries once, before its first file
+    with ProcessPoolExecutor(max_workers=min(jobs, total), initializer=get_opencc_converter) as executor:
+        futures = {}
+        for stata_file in files_to_convert:
+            print(f"Queued: {os.path.basename(stata_file)}")
+            future = executor.submit(
+                convert_stata_file_timed, stata_file, output_formats, output_dir, streaming, chunksize, manifest, force,
+                profile
+            )
+            futures[future] = stata_file
+        for future in as_completed(futures):
+            stata_file = futures[future]
+            try:
+                file_results, manifest_updates, stats = future.result()
+            except Exception as e:
+                print(f"Error converting {stata_file}: {e}")
+                file_results = {output_format: False for output_format in output_formats}
+                manifest_updates = {}
+                stats = {'file': os.path.basename(stata_file), 'outputs': file_results, 'converted': [],
+                         'rows': None, 'seconds': None, 'rows_per_second': None}
+            report(stata_file, file_results, manifest_updates, stats)
+    return results
+
+def write_stats(results, stats_path):
+    """Write per-file conversion stats as JSON lines ('-' for stdout, otherwise appended)"""
+    import json
+    from datetime import datetime
+    
+    timestamp = datetime.now().isoformat(timespec='seconds')
+    lines = [json.dumps({'timestamp': timestamp, **stats}, ensure_ascii=False) for stats in results.values()]
+    if stats_path == '-':
+        print("\n".join(lines))
+        return
+    with open(stats_path, 'a', encoding='utf-8') as f:
+        for line in lines:
+            f.write(line + "\n")
+    print(f"Conversion stats appended to {stats_path}")
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        description="Stata to CSV/Excel/Parquet Converter. "
+                    "Without input files the converter runs interactively on dta/."
+    )
+    parser.add_argument(
+        "inputs", nargs="*",
+        help="Input .dta files or glob patterns (e.g. 'dta/*.dta'); enables non-interactive mode"
+    )
+    parser.add_argument(
+        "--format", "-f", dest="formats", action="append", choices=list(OUTPUT_WRITERS),
+        help="Output format, repeatable (default: csv)"
+    )
+    parser.add_argument(
+        "--output-dir", "-o", default="output",
+        help="Output directory (default: output)"
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=None,
+        help="Stream the CSV output in chunks of this many rows"
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=None,
+        help="Number of files converted in parallel (default: one per file, up to the CPU count). "
+             "Each worker holds a whole file in memory unless streaming is used."
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help=f"Reconvert every file even if {MANIFEST_FILENAME} says its outputs are up to date"
+    )
+    parser.add_argument(
+        "--stats", metavar="PATH", default=None,
+        help="Append per-file timing and row-count stats as JSON lines to PATH ('-' for stdout)"
+    )
+    parser.add_argument(
+        "--profile", choices=['cprofile', 'tracemalloc'], default=None,
+        help="Profile each conversion with cProfile or tracemalloc; results go into <name>.report.json"
+    )
+    parser.add_argument(
+        "--merge", metavar="PATH", default=None,
+        help="After converting, merge the CSV outputs of all inputs into one CSV at PATH with a release column"
+    )
+    return parser.parse_args(argv)
+
+def run_batch(args):
+    """Non-interactive conversion of the files matched by args.inputs
+    
+    No dependency probing or prompts. Returns a process exit code.
+    """
+    files_to_convert = []
+    for pattern in args.inputs:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        for path in matches:
+            if path not in files_to_convert:
+                files_to_convert.append(path)
+    
+    output_formats = args.formats or ['csv']
+    ensure_output_dir(args.output_dir)
+    jobs = args.jobs or min(len(files_to_convert), os.cpu_count() or 1)
+    print(f"Processing {len(files_to_convert)} file(s) to {', '.join(output_formats)} with {jobs} worker(s)...")
+    
+    results = convert_files(
+        files_to_convert, output_formats, args.output_dir, jobs=jobs,
+        streaming=args.chunksize is not None, chunksize=args.chunksize or DEFAULT_CHUNKSIZE, force=args.force,
+        profile=args.profile
+    )
+    if args.stats:
+        write_stats(results, args.stats)
+    
+    failed = [path for path, stats in results.items() if not all(stats['outputs'].values())]
+    print(f"\nConversion completed! {len(results) - len(failed)}/{len(results)} files converted successfully.")
+    
+    if args.merge:
+        from release_merge import merge_releases
+        csv_paths = [get_output_path(path, 'csv', args.output_dir) for path, stats in results.items()
+                     if stats['outputs'].get('csv')]
+        if 'csv' not in output_formats or len(csv_paths) < len(results):
+            print("Error: --merge needs a successful CSV output (-f csv) for every input")
+            return 1
+        merge_stats = merge_releases(csv_paths, args.merge, args.chunksize or DEFAULT_CHUNKSIZE)
+        print(f"Merged {len(csv_paths)} release(s) into {merge_stats['rows_written']} rows "
+              f"({merge_stats['duplicates']} duplicates dropped): {args.merge}")
+    return 1 if failed else 0
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.inputs:
+        return run_batch(args)
+    
+    print("Stata to CSV/Excel/Parquet Converter")
     print("=" * 40)
     
     # Check and install dependencies
@@ -193,7 +975,7 @@ def main():
     import questionary
     
     # Ensure output directory exists
-    ensure_output_dir()
+    ensure_output_dir(args.output_dir)
     
     # Scan for .dta files
     print("\nScanning dta/ directory for .dta files...")
@@ -223,15 +1005,29 @@ def main():
         return
     
     # Format selection
-    format_choice = questionary.select(
-        "Select output format:",
-        choices=["CSV only", "Excel only", "Both CSV and Excel"]
+    format_labels = {display_name: output_format for output_format, (_, display_name, _) in OUTPUT_WRITERS.items()}
+    selected_formats = questionary.checkbox(
+        "Select output format(s):",
+        choices=list(format_labels)
     ).ask()
     
-    if not format_choice:
+    if not selected_formats:
         print("No format selected. Exiting.")
         return
     
+    output_formats = [format_labels[label] for label in selected_formats]
+    if any(output_format in ARROW_FORMATS for output_format in output_formats):
+        check_and_install_dependencies(['pyarrow'])
+    
+    # Streaming keeps memory bounded by chunk size for large releases
+    chunksize = args.chunksize or DEFAULT_CHUNKSIZE
+    use_streaming = False
+    if 'csv' in output_formats:
+        use_streaming = questionary.confirm(
+            f"Stream CSV conversion in chunks of {chunksize} rows (lower memory)?",
+            default=False
+        ).ask()
+    
     # Process files
     if "Select all files" in selected_files:
         files_to_convert = dta_files
@@ -244,27 +1040,20 @@ def main():
                     files_to_convert.append(full_path)
                     break
     
-    print(f"\nProcessing {len(files_to_convert)} file(s)...")
+    jobs = args.jobs or min(len(files_to_convert), os.cpu_count() or 1)
+    print(f"\nProcessing {len(files_to_convert)} file(s) with {jobs} worker(s)...")
     
-    success_count = 0
-    for stata_file in files_to_convert:
-        print(f"\nConverting: {os.path.basename(stata_file)}")
-        
-        file_success = False
-        
-        if format_choice in ["CSV only", "Both CSV and Excel"]:
-            csv_success = convert_stata_to_csv(stata_file)
-            file_success = file_success or csv_success
-        
-        if format_choice in ["Excel only", "Both CSV and Excel"]:
-            excel_success = convert_stata_to_excel(stata_file)
-            file_success = file_success or excel_success
-        
-        if file_success:
-            success_count += 1
+    results = convert_files(
+        files_to_convert, output_formats, args.output_dir, jobs=jobs,
+        streaming=use_streaming, chunksize=chunksize, force=args.force, profile=args.profile
+    )
+    success_count = sum(1 for stats in results.values() if any(stats['outputs'].values()))
     
     print(f"\nConversion completed! {success_count}/{len(files_to_convert)} files converted successfully.")
-    print("Output files saved to output/ directory.")
+    print(f"Output files saved to {args.output_dir}/ directory.")
+    if args.stats:
+        write_stats(results, args.stats)
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Synthetic CGED-Q-shaped .dta generator for benchmarks
+
+The real CGED-Q releases cannot live in the repository, so this writes .dta files with
+the same raw (simplified Chinese) column schema and roughly realistic cardinalities:
+a few hundred surnames, thousands of given names, the 24 banners on about a fifth of
+the officials, a few dozen 出身/身份 values, hundreds of institutions and titles, and
+careers that run over consecutive editions (阳历年份, 季节号). Some records drop 出身一, as
+the real data does between editions, so PersonUID and linkage see realistic splits.
+
+Usage: python synthetic_cgedq.py <rows> [output .dta path] [--seed N]
+"""
+
+import os
+import sys
+
+SURNAMES = list(
+    '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖'
+    '贾夏韦方白邹孟熊秦邱江尹薛段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤常温康施文牛樊葛邢安齐易乔伍庞颜倪庄聂章鲁岳翟'
+) + ['爱新觉罗', '纳兰', '钮祜禄', '瓜尔佳', '富察', '那拉', '佟佳', '赫舍里', '西林觉罗', '伊尔根觉罗']
+
+GIVEN_NAME_CHARS = list('国华文明世杰德昌兴荣书庆福寿安泰永嘉祥瑞光宗麟凤龙云鹏翰林学士启元长春尧舜禹孝忠义礼智信恩泽锡绍维'
+                        '钧铭绪增璋琦镇钰善廷桂芳耀辉俊彦懋鸿')
+
+BANNERS = [f'{color}{group}' for color in ['镶黄旗', '正黄旗', '正白旗', '正红旗', '镶白旗', '镶红旗', '正蓝旗', '镶蓝旗']
+           for group in ['满洲', '蒙古', '汉军']]
+
+BACKGROUNDS = ['进士', '举人', '擧人', '贡生', '监生', '荫生', '笔帖式', '翻译进士', '翻译举人', '恩贡', '拔贡', '副贡',
+               '岁贡', '优贡', '捐纳', '议叙', '供事', '吏员', '武进士', '武举', '官学生', '俊秀']
+
+STATUSES = ['监生', '贡生', '举人', '进士', '生员', '附生', '廪生', '增生', '荫生', '廪贡', '附贡', '职员']
+
+PROVINCES = ['直隶', '江苏', '浙江', '安徽', '江西', '福建', '湖北', '湖南', '河南', '山东', '山西', '陕西', '甘肃',
+             '四川', '广东', '广西', '云南', '贵州', '奉天', '吉林', '黑龙江', '新疆']
+
+CENTRAL_INSTITUTIONS = ['吏部', '户部', '礼部', '兵部', '刑部', '工部', '都察院', '翰林院', '内阁', '理藩院', '通政使司',
+                        '大理寺', '太常寺', '光禄寺', '太仆寺', '鸿胪寺', '国子监', '钦天监', '詹事府', '宗人府', '内务府']
+
+CENTRAL_TITLES = ['尚书', '侍郎', '郎中', '员外郎', '主事', '笔帖式', '堂主事', '学士', '侍读', '侍讲', '编修', '检讨',
+                  '给事中', '御史', '少卿', '寺丞', '博士', '典簿', '司务', '中书']
+
+LOCAL_TITLES = ['知县', '知府', '知州', '同知', '通判', '县丞', '主簿', '典史', '教谕', '训导', '巡检', '布政使',
+                '按察使', '道员', '盐运使', '州同', '州判', '吏目', '经历', '照磨']
+
+PLACE_CHARS = list('安宁平阳山河东西南北江海清新武昌德兴永泰城丰乐化仁和庆嘉定远通利常宜临沂阴州溪源益')
+
+# Share of persons with a value in these columns
+BANNER_SHARE = 0.2
+BACKGROUND_SHARE = 0.65
+STATUS_SHARE = 0.4
+
+# Share of a person's records that drop 出身一 (inconsistent recording across editions)
+BACKGROUND_DROPOUT = 0.05
+
+# Average career length in editions, and the span of the synthetic years
+MEAN_CAREER_EDITIONS = 8
+FIRST_YEAR, LAST_YEAR = 1760, 1912
+
+def zipf_choice(rng, values, size, exponent=1.1):
+    """Draw values with Zipf-like frequencies (the first values are the most common)"""
+    import numpy as np
+    
+    weights = 1.0 / np.arange(1, len(values) + 1) ** exponent
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=weights / weights.sum())]
+
+def optional_choice(rng, values, size, share, exponent=1.1):
+    """Like zipf_choice, but only a share of the draws get a value ('' otherwise)"""
+    import numpy as np
+    
+    return np.where(rng.random(size) < share, zipf_choice(rng, values, size, exponent), '').astype(object)
+
+def build_vocabularies(rng):
+    """Given names, counties, institutions and titles built from the character pools"""
+    import numpy as np
+    
+    chars = np.array(GIVEN_NAME_CHARS, dtype=object)
+    given_names = sorted(set(rng.choice(chars, 4000) + rng.choice(chars, 4000))) + list(GIVEN_NAME_CHARS)
+    rng.shuffle(given_names)
+    
+    places = np.array(PLACE_CHARS, dtype=object)
+    counties = sorted(set(rng.choice(places, 1500) + rng.choice(places, 1500)))
+    rng.shuffle(counties)
+    county_provinces = rng.choice(len(PROVINCES), len(counties))
+    
+    institutions = list(CENTRAL_INSTITUTIONS)
+    institutions += [f'{province}{office}' for province in PROVINCES
+                     for office in ['布政使司', '按察使司', '巡抚', '学政', '盐运使司']]
+    institutions += [f'{county}府' for county in counties[:200]]
+    titles = list(CENTRAL_TITLES) + list(LOCAL_TITLES)
+    titles += [f'{department[:-1] if department.endswith("部") else department}{title}'
+               for department in CENTRAL_INSTITUTIONS[:6] for title in ['尚书', '侍郎', '郎中']]
+    return given_names, counties, county_provinces, institutions, titles
+
+def generate_cgedq_frame(rows, seed=0):
+    """Build a DataFrame with the raw CGED-Q column schema and `rows` records"""
+    import numpy as np
+    import pandas as pd
+    
+    rng = np.random.default_rng(seed)
+    given_names, counties, county_provinces, institutions, titles = build_vocabularies(rng)
+    
+    # Persons and their career lengths, enough to cover `rows` records
+    lengths = rng.geometric(1 / MEAN_CAREER_EDITIONS, size=rows // MEAN_CAREER_EDITIONS * 2 + 1)
+    lengths = lengths[:np.searchsorted(np.cumsum(lengths), rows) + 1]
+    lengths[-1] -= lengths.sum() - rows
+    persons = len(lengths)
+    
+    origin_county = rng.integers(0, len(counties), persons)
+    person = pd.DataFrame({
+        '姓': zipf_choice(rng, SURNAMES, persons, 0.9),
+        '名': zipf_choice(rng, given_names, persons, 0.7),
+        '身份二': optional_choice(rng, STATUSES, persons, STATUS_SHARE),
+        '旗分': optional_choice(rng, BANNERS, persons, BANNER_SHARE, 0.3),
+        '出身一': optional_choice(rng, BACKGROUNDS, persons, BACKGROUND_SHARE),
+        '原籍省': np.array(PROVINCES, dtype=object)[county_provinces[origin_county]],
+        '原籍县': np.array(counties, dtype=object)[origin_county],
+    })
+    # Bannermen have no civil origin county
+    person.loc[person['旗分'] != '', ['原籍省', '原籍县']] = ''
+    
+    # One record per edition of each career, editions one to four seasons apart
+    person_index = np.repeat(np.arange(persons), lengths)
+    starts = np.r_[0, np.cumsum(lengths)[:-1]]
+    step = rng.integers(1, 5, rows)
+    step[starts] = 0
+    first_edition = rng.integers(0, (LAST_YEAR - FIRST_YEAR) * 4, persons)
+    edition = first_edition[person_index] + (np.cumsum(step) - np.repeat(np.cumsum(step)[starts], lengths))
+    edition = np.minimum(edition, (LAST_YEAR - FIRST_YEAR + 1) * 4 - 1)
+    
+    df = person.iloc[person_index].reset_index(drop=True)
+    df['出身一'] = np.where(rng.random(rows) < BACKGROUND_DROPOUT, '', df['出身一']).astype(object)
+    df['官职一'] = zipf_choice(rng, titles, rows)
+    df['机构一'] = optional_choice(rng, institutions, rows, 0.8)
+    df['地区'] = optional_choice(rng, PROVINCES, rows, 0.9, 0.5)
+    df['阳历年份'] = (FIRST_YEAR + edition // 4).astype(float)
+    df['季节号'] = (edition % 4 + 1).astype(float)
+    
+    # Records are listed edition by edition; 序号 restarts within each edition
+    df = df.sort_values(['阳历年份', '季节号'], kind='stable').reset_index(drop=True)
+    df['序号'] = (df.groupby(['阳历年份', '季节号']).cumcount() + 1).astype(float)
+    df['record_number'] = np.arange(1, rows + 1, dtype=float)
+    
+    columns = ['record_number', '阳历年份', '季节号', '序号', '姓', '名', '身份二', '旗分', '出身一',
+               '官职一', '机构一', '地区', '原籍省', '原籍县']
+    return df[columns]
+
+def write_cgedq_dta(rows, output_path, seed=0):
+    """Generate `rows` synthetic records and write them as a .dta file"""
+    import pyreadstat
+    
+    df = generate_cgedq_frame(rows, seed)
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    pyreadstat.write_dta(df, output_path)
+    return df
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    seed = 0
+    if '--seed' in args:
+        i = args.index('--seed')
+        seed = int(args[i + 1])
+        del args[i:i + 2]
+    if not args:
+        print("Usage: python synthetic_cgedq.py <rows> [output .dta path] [--seed N]")
+        sys.exit(1)
+    rows = int(args[0])
+    output_path = args[1] if len(args) > 1 else os.path.join("dta", f"synthetic_{rows}.dta")
+    df = write_cgedq_dta(rows, output_path, seed)
+    print(f"Wrote {len(df)} synthetic records: {output_path}")
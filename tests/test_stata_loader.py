@@ -0,0 +1,38 @@
+"""
+Cache housekeeping of stata_loader.load_stata_file
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pyreadstat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stata_loader import get_cache_paths, load_stata_file
+
+def write_dta(path, values):
+    pyreadstat.write_dta(pd.DataFrame({'x': values}), str(path))
+
+def test_stale_cache_removal_keeps_files_sharing_a_name_prefix(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    short_file = tmp_path / 'cgedq.dta'
+    long_file = tmp_path / 'cgedq-1900.dta'
+    write_dta(short_file, [1.0, 2.0])
+    write_dta(long_file, [3.0])
+    
+    load_stata_file(str(long_file), cache_dir=cache_dir)
+    long_cache = get_cache_paths(str(long_file), cache_dir)
+    load_stata_file(str(short_file), cache_dir=cache_dir)
+    assert all(os.path.exists(path) for path in long_cache)
+    
+    # A new version of cgedq.dta evicts only its own old cache
+    old_short_cache = get_cache_paths(str(short_file), cache_dir)
+    write_dta(short_file, [1.0, 2.0, 5.0])
+    os.utime(short_file, ns=(os.stat(short_file).st_atime_ns, os.stat(short_file).st_mtime_ns + 10**9))
+    df, _ = load_stata_file(str(short_file), cache_dir=cache_dir)
+    assert df['x'].tolist() == [1.0, 2.0, 5.0]
+    assert not any(os.path.exists(path) for path in old_short_cache)
+    assert all(os.path.exists(path) for path in get_cache_paths(str(short_file), cache_dir))
+    assert all(os.path.exists(path) for path in long_cache)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Precomputed career transition graphs for the Career Path and Career Alluvial charts
+
+CareerAlluvialChart builds each official's path (出身一, then 機構一 or 官職一 of every
+record in record_number order, padded with '(職業結束)') and counts transitions
+between consecutive stages in the browser. This module counts the same transitions
+offline, once per stage field and banner filter, as compact edge lists:
+
+- edges: (origin, last, step, source, target) -> officials, where origin is the
+  official's 出身一 ('(無出身記錄)' when empty), last is their final 機構一/官職一 (the
+  destination filter), and step s is the transition from stage s to stage s + 1
+  (stage 0 is the origin). Edges are sorted by origin, and origin_offsets gives each
+  origin's slice, so an origin filter is a slice. Background tracking groups links by
+  origin and institution tracking by source; both are columns of the same rows.
+- lengths: (origin, last, length) -> officials. Officials whose career ended before a
+  step flow '(職業結束)' -> '(職業結束)' there, and the full path has max length + 1
+  stages, so full and simplified paths are the same rows cut at different steps.
+- first_reach: (origin, last, value) -> the earliest step number at which any of those
+  officials reaches value, as calculateDynamicMaxSteps computes for "smart steps".
+
+The Career Path chart's first/last institution counts per standardized background
+are included as well.
+"""
+
+import json
+import os
+import sys
+
+# Stage fields of the alluvial chart tabs
+TRANSITION_FIELDS = ['機構一', '官職一']
+
+NO_RECORD_LABEL = '(無記錄)'
+NO_BACKGROUND_LABEL = '(無出身記錄)'
+CAREER_END_LABEL = '(職業結束)'
+NO_INSTITUTION_LABEL = '(無機構記錄)'
+
+TRANSITIONS_VERSION = 1
+
+def label_column(df, col, missing_label):
+    """Column values as text, with missing or empty values replaced by missing_label"""
+    import numpy as np
+    from career_tables import text_column
+    
+    values = text_column(df, col)
+    return np.where(values != '', values, missing_label).astype(object)
+
+def sort_by_record_number(df):
+    """Records grouped by PersonUID in record_number order, as the charts sort them"""
+    sort_columns = ['PersonUID'] + (['record_number'] if 'record_number' in df.columns else [])
+    return df[df['PersonUID'].notna()].sort_values(sort_columns, kind='stable').reset_index(drop=True)
+
+def to_columns(frame, int_columns):
+    """DataFrame -> dict of column lists (the columnar layout used by the JSON tables)"""
+    return {col: frame[col].astype('int64').tolist() for col in int_columns}
+
+def build_transition_graph(df, field, labels):
+    """
+    Edge list, career lengths and first-reach steps for one stage field
+    
+    labels is a shared dict of label -> code, extended with every label used here.
+    """
+    import numpy as np
+    import pandas as pd
+    from career_tables import get_career_offsets, get_career_stages
+    
+    sorted_df = sort_by_record_number(df)
+    offsets = get_career_offsets(sorted_df)
+    person_index, stage, _ = get_career_stages(offsets)
+    starts, lasts = offsets[:-1], offsets[1:] - 1
+    
+    def encode(values):
+        return np.array([labels.setdefault(value, len(labels)) for value in values], dtype=np.int64)
+    
+    positions = encode(label_column(sorted_df, field, NO_RECORD_LABEL))
+    origin_values = label_column(sorted_df.iloc[starts], '出身一', NO_BACKGROUND_LABEL)
+    origins, person_origin = np.unique(origin_values, return_inverse=True)
+    person_origin = person_origin.reshape(-1)
+    person_last = positions[lasts]
+    lengths = lasts - starts + 1
+    end_code = labels.setdefault(CAREER_END_LABEL, len(labels))
+    
+    # One transition into every record (from the origin or the previous record), plus the end
+    previous = np.r_[-1, positions[:-1]]
+    source = np.where(stage == 1, encode(origins)[person_origin[person_index]], previous)
+    transitions = pd.DataFrame({
+        'origin': np.r_[person_origin[person_index], person_origin],
+        'last': np.r_[person_last[person_index], person_last],
+        'step': np.r_[stage - 1, lengths],
+        'source': np.r_[source, person_last],
+        'target': np.r_[positions, np.full(len(lengths), end_code)],
+    })
+    keys = ['origin', 'last', 'step', 'source', 'target']
+    edges = transitions.groupby(keys, sort=True).size().rename('count').reset_index()
+    origin_offsets = np.searchsorted(edges['origin'].to_numpy(), np.arange(len(origins) + 1))
+    
+    persons = pd.DataFrame({'origin': person_origin, 'last': person_last, 'length': lengths})
+    length_counts = persons.groupby(['origin', 'last', 'length'], sort=True).size().rename('count').reset_index()
+    
+    # First step at which each official reaches each value (stage + 1, as in the chart)
+    reached = pd.DataFrame({
+        'person': person_index, 'origin': person_origin[person_index], 'last': person_last[person_index],
+        'value': positions, 'step': stage + 1,
+    }).drop_duplicates(['person', 'value'])
+    first_reach = reached.groupby(['origin', 'last', 'value'], sort=True)['step'].agg(['min', 'size'])
+    first_reach = first_reach.rename(columns={'min': 'step', 'size': 'count'}).reset_index()
+    
+    return {
+        'person_count': len(lengths),
+        'max_length': int(lengths.max()) if len(lengths) else 0,
+        'origins': encode(origins).tolist(),
+        'origin_offsets': origin_offsets.tolist(),
+        'edges': to_columns(edges, keys + ['count']),
+        'lengths': to_columns(length_counts, ['origin', 'last', 'length', 'count']),
+        'first_reach': to_columns(first_reach, ['origin', 'last', 'value', 'step', 'count']),
+    }
+
+def build_path_chart_counts(df):
+    """First/last 機構一 per standardized background, as in CareerPathChart"""
+    import pandas as pd
+    from career_tables import get_career_offsets, standardized_background
+    
+    sorted_df = sort_by_record_number(df)
+    offsets = get_career_offsets(sorted_df)
+    first_rows = sorted_df.iloc[offsets[:-1]]
+    institutions = label_column(sorted_df, '機構一', NO_INSTITUTION_LABEL)
+    persons = pd.DataFrame({
+        'background': standardized_background(first_rows),
+        'first': institutions[offsets[:-1]],
+        'last': institutions[offsets[1:] - 1],
+    })
+    counts = {}
+    for kind in ['first', 'last']:
+        grouped = persons.groupby(['background', kind], sort=True).size().rename('count').reset_index()
+        counts[kind] = {'background': grouped['background'].tolist(), 'institution': grouped[kind].tolist(),
+                        'count': grouped['count'].tolist()}
+    return counts
+
+def build_transition_graphs(df):
+    """
+    All transition graphs as a JSON-serialisable dict
+    
+    graphs[field][variant] with variant 'all' or 'exclude_banner' (records with a 旗分
+    dropped first, like the charts' excludeBanner switch). Label codes index "labels".
+    """
+    from career_tables import text_column
+    
+    labels = {}
+    variants = {'all': df, 'exclude_banner': df[text_column(df, '旗分') == '']}
+    graphs = {
+        field: {variant: build_transition_graph(frame, field, labels) for variant, frame in variants.items()}
+        for field in TRANSITION_FIELDS
+    }
+    return {
+        'version': TRANSITIONS_VERSION,
+        'end_label': CAREER_END_LABEL,
+        'labels': list(labels),
+        'graphs': graphs,
+        'path_chart': {variant: build_path_chart_counts(frame) for variant, frame in variants.items()},
+    }
+
+def write_transition_graphs(df, output_path):
+    """Write the transition graphs for a converted DataFrame as compact JSON"""
+    graphs = build_transition_graphs(df)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(graphs, f, ensure_ascii=False, separators=(',', ':'))
+    return graphs
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python transition_graphs.py output/<converted file>.csv|.parquet|.feather ...")
+        sys.exit(1)
+    from career_tables import load_converted_output
+    for converted_path in sys.argv[1:]:
+        output_path = os.path.splitext(converted_path)[0] + '.transitions.json'
+        graphs = write_transition_graphs(load_converted_output(converted_path), output_path)
+        edge_count = sum(len(graph['edges']['count']) for variants in graphs['graphs'].values()
+                         for graph in variants.values())
+        print(f"Wrote transition graphs ({edge_count} edges): {output_path}")
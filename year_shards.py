@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Per-year (or per year range) CSV shards with a partition manifest
+
+Instead of one CSV per release, the converted records are split by 陽曆年份 into
+<name>.<key>.csv shards, where key is the year ("1760") or an aligned year range
+("1760-1764"); records without a year go to <name>.unknown.csv. <name>.shards.json lists
+every shard with its row count, the value ranges of 陽曆年份, 季節號 and record_number,
+and a content hash. Loaders fetch only the shards overlapping the years they need,
+and rewriting the shards after a new edition is added only touches the shard whose
+content changed.
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+PARTITION_COLUMN = '陽曆年份'
+
+# Columns whose min/max are listed per shard
+RANGE_COLUMNS = ['陽曆年份', '季節號', 'record_number']
+
+UNKNOWN_SHARD_KEY = 'unknown'
+
+SHARDS_VERSION = 1
+
+def get_shard_start(years, span):
+    """First year of the aligned range each year falls in (ranges start at multiples of span)"""
+    return years - years % span
+
+def get_shard_key(start, span):
+    """Shard key for a range starting at `start`: '1760' or '1760-1764'"""
+    return str(start) if span == 1 else f"{start}-{start + span - 1}"
+
+def get_shard_path(manifest_path, key):
+    """Shard file path next to the manifest: <name>.shards.json -> <name>.<key>.csv"""
+    return manifest_path[:-len('.shards.json')] + f'.{key}.csv'
+
+def load_shard_manifest(manifest_path):
+    """Load a partition manifest, or None if there is none"""
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def get_value_range(series):
+    """[min, max] of a numeric column as plain numbers, or None if it has no values"""
+    values = series.dropna()
+    if values.empty:
+        return None
+    low, high = values.min(), values.max()
+    return [int(low) if float(low).is_integer() else float(low), int(high) if float(high).is_integer() else float(high)]
+
+def write_year_shards(df, manifest_path, span=1):
+    """
+    Write the year shards and partition manifest for a converted DataFrame
+    
+    Shards are aligned to multiples of span, so adding an edition changes one shard.
+    A shard is only rewritten when its CSV content differs from the file listed in
+    the existing manifest, and shards that no longer have records are removed.
+    Returns the manifest dict.
+    """
+    import numpy as np
+    
+    previous = load_shard_manifest(manifest_path) or {}
+    previous_hashes = {shard['key']: shard['sha256'] for shard in previous.get('shards', [])
+                       if previous.get('span') == span}
+    
+    years = df[PARTITION_COLUMN] if PARTITION_COLUMN in df.columns else None
+    if years is None:
+        keys = np.full(len(df), UNKNOWN_SHARD_KEY, dtype=object)
+    else:
+        starts = get_shard_start(years.fillna(-1).astype(np.int64).to_numpy(), span)
+        keys = np.array([get_shard_key(start, span) for start in starts], dtype=object)
+        keys[years.isna().to_numpy()] = UNKNOWN_SHARD_KEY
+    
+    manifest = {
+        'version': SHARDS_VERSION,
+        'partition_column': PARTITION_COLUMN,
+        'span': span,
+        'row_count': len(df),
+        'columns': [str(col) for col in df.columns],
+        'shards': [],
+    }
+    written = 0
+    # groupby keeps the original record order within each shard
+    for key, shard in df.groupby(keys, sort=True):
+        content = shard.to_csv(index=False).encode('utf-8-sig')
+        sha256 = hashlib.sha256(content).hexdigest()
+        shard_path = get_shard_path(manifest_path, key)
+        if previous_hashes.get(key) != sha256 or not os.path.exists(shard_path):
+            with open(shard_path, 'wb') as f:
+                f.write(content)
+            written += 1
+        entry = {
+            'key': key,
+            'file': os.path.basename(shard_path),
+            'rows': len(shard),
+            'sha256': sha256,
+            'ranges': {col: get_value_range(shard[col]) for col in RANGE_COLUMNS if col in shard.columns},
+        }
+        manifest['shards'].append(entry)
+    
+    # Shards from the previous manifest that are gone now
+    current_keys = {shard['key'] for shard in manifest['shards']}
+    for shard in previous.get('shards', []):
+        if shard['key'] not in current_keys:
+            stale_path = get_shard_path(manifest_path, shard['key'])
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+    
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    manifest['written'] = written
+    return manifest
+
+def select_shards(manifest, first_year=None, last_year=None):
+    """Shards whose 陽曆年份 range overlaps [first_year, last_year] (None = unbounded)"""
+    if first_year is None and last_year is None:
+        return list(manifest['shards'])
+    selected = []
+    for shard in manifest['shards']:
+        year_range = shard['ranges'].get(PARTITION_COLUMN)
+        if year_range is None:
+            continue
+        if (first_year is None or year_range[1] >= first_year) and (last_year is None or year_range[0] <= last_year):
+            selected.append(shard)
+    return selected
+
+def read_year_shards(manifest_path, first_year=None, last_year=None):
+    """Read the shards overlapping a year range back into one DataFrame"""
+    import pandas as pd
+    
+    manifest = load_shard_manifest(manifest_path)
+    frames = [pd.read_csv(get_shard_path(manifest_path, shard['key']), encoding='utf-8-sig')
+              for shard in select_shards(manifest, first_year, last_year)]
+    if not frames:
+        return pd.DataFrame(columns=manifest['columns'])
+    df = pd.concat(frames, ignore_index=True)
+    if first_year is not None:
+        df = df[df[PARTITION_COLUMN] >= first_year]
+    if last_year is not None:
+        df = df[df[PARTITION_COLUMN] <= last_year]
+    return df.reset_index(drop=True)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    span = 1
+    if '--years' in args:
+        i = args.index('--years')
+        span = int(args[i + 1])
+        del args[i:i + 2]
+    if not args:
+        print("Usage: python year_shards.py output/<converted file>.csv|.parquet|.feather ... [--years N]")
+        print("--years N groups N consecutive years per shard (default: one shard per year)")
+        sys.exit(1)
+    from career_tables import load_converted_output
+    for converted_path in args:
+        manifest_path = os.path.splitext(converted_path)[0] + '.shards.json'
+        manifest = write_year_shards(load_converted_output(converted_path), manifest_path, span)
+        print(f"Wrote {len(manifest['shards'])} shards ({manifest['written']} changed): {manifest_path}")